@@ -0,0 +1,278 @@
+"""Benchmarks for the simulation, rendering and vision stages of Bubble Blast.
+
+Every benchmark drives the real classes from bubble_blast.py under SDL's
+dummy video and audio drivers, so it runs on machines with no display,
+sound card or camera.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pygame
+
+import bubble_blast as bb
+
+SEED = 1234
+WIDTH, HEIGHT = 800, 600
+
+
+def make_game(**kwargs):
+    return bb.BubbleGame(headless=True, seed=SEED, **kwargs)
+
+
+def fill_pool(pool, count, rng):
+    # Long-lived bubbles so the population stays constant for the whole run
+    for _ in range(count):
+        pool.spawn_slot(rng.uniform(40, WIDTH - 40), rng.uniform(0, HEIGHT))
+    pool.lifetime[:pool.count] = 10 ** 9
+    pool.dy[:pool.count] = 0.0
+    pool.y[:pool.count] += HEIGHT * 1000  # far below the top edge, they never float away
+
+
+def bench_pool_step(count):
+    def setup():
+        rng = np.random.default_rng(SEED)
+        pool = bb.BubblePool(WIDTH, HEIGHT, capacity=count, rng=rng_compat(SEED))
+        fill_pool(pool, count, rng)
+        return pool.step
+    return setup
+
+
+def bench_view_move(count):
+    def setup():
+        rng = np.random.default_rng(SEED)
+        pool = bb.BubblePool(WIDTH, HEIGHT, capacity=count, rng=rng_compat(SEED))
+        fill_pool(pool, count, rng)
+        views = list(pool)
+
+        def frame():
+            for bubble in views:
+                bubble.move()
+        return frame
+    return setup
+
+
+def bench_burst_storm(count):
+    def setup():
+        particles = bb.ParticleSystem(capacity=8192, rng=np.random.default_rng(SEED))
+        sounds = bb.SoundBank()
+        pool = bb.BubblePool(WIDTH, HEIGHT, rng=rng_compat(SEED), particles=particles,
+                             sounds=sounds)
+        rng = np.random.default_rng(SEED)
+
+        def frame():
+            for _ in range(count):
+                pool.spawn_slot(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+            for bubble in list(pool):
+                bubble.burst_bubble()
+            pool.step()
+            particles.step()
+            sounds.flush()
+        return frame
+    return setup
+
+
+def bench_blow_effects(count):
+    def setup():
+        particles = bb.ParticleSystem(capacity=8192, rng=np.random.default_rng(SEED))
+        effects = []
+        pool = bb.FreeList(bb.BlowEffect)
+
+        def frame():
+            while len(effects) < count:
+                effects.append(pool.acquire(WIDTH // 2, HEIGHT - 50, particles))
+            for effect in list(effects):
+                if not effect.update():
+                    effects.remove(effect)
+                    pool.release(effect)
+            particles.step()
+        return frame
+    return setup
+
+
+def bench_stream(count, pattern):
+    def setup():
+        game = make_game(adaptive_quality=False)
+
+        def frame():
+            game.create_bubble_stream(WIDTH // 2, HEIGHT - 50, pattern=pattern, count=count)
+            game.bubbles.count = 0  # drop them again so every frame spawns into the same pool
+        return frame
+    return setup
+
+
+def bench_draw(count, renderer="software"):
+    def setup():
+        game = make_game(renderer=renderer)
+        rng = np.random.default_rng(SEED)
+        fill_pool(game.bubbles, count, rng)
+        game.bubbles.y[:game.bubbles.count] = rng.uniform(0, HEIGHT, game.bubbles.count)
+        game.bubbles.lifetime[:game.bubbles.count] = rng.integers(1, 256, game.bubbles.count)
+        for _ in range(5):
+            game.particles.emit_burst(WIDTH / 2, HEIGHT / 2, (255, 200, 255), count=count // 10)
+            game.blow_effects.append(bb.BlowEffect(WIDTH // 2, HEIGHT - 50, game.particles))
+        return game.draw
+    return setup
+
+
+def bench_camera(quality):
+    def setup():
+        frames = synthetic_frames(32)
+        game = make_game(trace=bb.InputTrace(frames=frames), motion_quality=quality)
+        game.startup_delay = 0
+        state = {"frame": 0}
+
+        def frame():
+            game.frame_count = state["frame"] % len(frames)
+            game.check_camera_interaction()
+            state["frame"] += 1
+        return frame
+    return setup
+
+
+def synthetic_frames(count):
+    # Noisy background with two bright "hands" sweeping across the frame
+    rng = np.random.default_rng(SEED)
+    frames = rng.integers(0, 40, (count, 480, 640, 3), dtype=np.uint8)
+    for i in range(count):
+        x = (i * 23) % 520
+        frames[i, 80:260, x:x + 120] = 220
+        frames[i, 300:420, 520 - x:640 - x] = 200
+    return frames
+
+
+def rng_compat(seed):
+    # BubblePool draws spawn values through the random module interface
+    return random.Random(seed)
+
+
+BENCHMARKS = {
+    "pool_step_100": bench_pool_step(100),
+    "pool_step_1k": bench_pool_step(1000),
+    "pool_step_10k": bench_pool_step(10000),
+    "bubble_move_100": bench_view_move(100),
+    "bubble_move_1k": bench_view_move(1000),
+    "bubble_move_10k": bench_view_move(10000),
+    "burst_storm_100": bench_burst_storm(100),
+    "blow_effects_20": bench_blow_effects(20),
+    "stream_fountain_12": bench_stream(12, "fountain"),
+    "stream_fountain_500": bench_stream(500, "fountain"),
+    "stream_wave_500": bench_stream(500, "wave"),
+    "draw_100": bench_draw(100),
+    "draw_1k": bench_draw(1000),
+    "draw_1k_textures": bench_draw(1000, renderer="sdl2"),
+    "camera_high": bench_camera("high"),
+    "camera_medium": bench_camera("medium"),
+    "camera_low": bench_camera("low"),
+}
+
+
+def measure(frame, frames, warmup, alloc_frames):
+    for _ in range(warmup):
+        frame()
+
+    times = np.empty(frames)
+    for i in range(frames):
+        start = time.perf_counter_ns()
+        frame()
+        times[i] = time.perf_counter_ns() - start
+    times /= 1e6
+
+    # Allocation pass is separate because tracing slows everything down
+    alloc_bytes = []
+    alloc_blocks = []
+    tracemalloc.start()
+    for _ in range(alloc_frames):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        frame()
+        alloc_bytes.append(tracemalloc.get_traced_memory()[1] - current)
+        alloc_blocks.append(sys.getallocatedblocks() - blocks)
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {
+        "frames": frames,
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(times.max()),
+        "alloc_peak_kb_per_frame": float(np.mean(alloc_bytes) / 1024) if alloc_bytes else 0.0,
+        "net_blocks_per_frame": float(np.mean(alloc_blocks)) if alloc_blocks else 0.0,
+    }
+
+
+def compare(results, baseline):
+    print(f"\n{'benchmark':<20}{'p50 before':>12}{'p50 after':>12}{'change':>10}")
+    for name, result in results.items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        print(f"{name:<20}{before['p50_ms']:>12.3f}{result['p50_ms']:>12.3f}{change:>9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--alloc-frames", type=int, default=30)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve() if args.output else None
+    baseline = Path(args.compare).resolve() if args.compare else None
+    pygame.init()
+    pygame.mixer.init()
+    names = args.names or list(BENCHMARKS)
+    unknown = sorted(set(names) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    print(f"{'benchmark':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'alloc kB':>10}")
+    for name in names:
+        frame = BENCHMARKS[name]()
+        results[name] = result = measure(frame, args.frames, args.warmup, args.alloc_frames)
+        print(f"{name:<20}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['alloc_peak_kb_per_frame']:>10.1f}")
+    pygame.quit()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+    if output:
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults written to {output}")
+    if baseline:
+        compare(results, json.loads(baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,274 @@
 from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
 import pygame
 import random
 from pygame import Surface, mixer
 import numpy as np
 import math
-import cv2
+import multiprocessing
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+# OpenCV is only imported once a camera (or a trace with camera frames) needs it
+cv2 = None
+
+def load_cv2():
+    global cv2
+    if cv2 is None:
+        import cv2 as module
+        cv2 = module
+    return cv2
+
+# LRU cache of pre-rendered circle sprites so drawing is just blitting
+class SpriteCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, alpha_step=16, phase_buckets=16):
+        self.max_bytes = max_bytes
+        self.alpha_step = alpha_step
+        self.phase_buckets = phase_buckets
+        self.sprites = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize_alpha(self, alpha):
+        return max(0, min(255, int(round(alpha / self.alpha_step)) * self.alpha_step))
+
+    def phase_bucket(self, phase):
+        return int(phase / (2 * math.pi) * self.phase_buckets) % self.phase_buckets
+
+    def _get(self, key, render):
+        surface = self.sprites.get(key)
+        if surface is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = render()
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self.sprites[key] = surface
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.sprites) > 1:
+            _, old = self.sprites.popitem(last=False)
+            self.bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+            self.evictions += 1
+        return surface
+
+    def circle(self, radius, rgb, alpha, width=0):
+        radius = int(radius)
+        rgb = tuple(int(c) for c in rgb)
+        alpha = self.quantize_alpha(alpha)
+
+        def render():
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (*rgb, alpha), (radius, radius), radius, width)
+            return surface
+
+        return self._get((radius, rgb, alpha, None, width), render)
+
+    def bubble(self, radius, rgb, alpha, phase, shimmer=True):
+        if not shimmer:
+            return self.circle(radius, rgb, alpha)
+        radius = int(radius)
+        rgb = tuple(int(c) for c in rgb)
+        alpha = self.quantize_alpha(alpha)
+        bucket = self.phase_bucket(phase)
+
+        def render():
+            angle = bucket * 2 * math.pi / self.phase_buckets
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (*rgb, alpha), (radius, radius), radius)
+            shimmer_pos = (
+                radius + math.cos(angle) * (radius * 0.3),
+                radius + math.sin(angle) * (radius * 0.3),
+            )
+            pygame.draw.circle(surface, (255, 255, 255, 100), shimmer_pos, radius * 0.2)
+            return surface
+
+        return self._get((radius, rgb, alpha, bucket, 0), render)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "sprites": len(self.sprites),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# shared by default, BubbleGame installs its own
+sprite_cache = SpriteCache()
+
+# recycles short-lived objects instead of leaving them to the garbage collector.
+# Pooled classes use __slots__ and set themselves up in reset(), which __init__ calls too.
+class FreeList:
+    def __init__(self, cls, max_free=256):
+        self.cls = cls
+        self.max_free = max_free
+        self.free = []
+        self.live = 0
+        self.peak_live = 0
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            self.hits += 1
+        else:
+            obj = self.cls.__new__(self.cls)
+            self.misses += 1
+        obj.reset(*args, **kwargs)
+        self.live += 1
+        self.peak_live = max(self.peak_live, self.live)
+        return obj
+
+    def release(self, obj):
+        self.live -= 1
+        if len(self.free) < self.max_free:
+            self.free.append(obj)
+
+    def stats(self):
+        acquired = self.hits + self.misses
+        return {
+            "live": self.live,
+            "peak_live": self.peak_live,
+            "free": len(self.free),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquired if acquired else 0.0,
+        }
+
+# make a font library for emoji support
+EMOJI_FONTS = ['Apple Color Emoji', 'Noto Color Emoji','Segoe UI Emoji', 'Arial Unicode MS', 'Arial']
+
+# stand-ins for emoji the font cannot render
+EMOJI_FALLBACKS = str.maketrans({
+    '🌬': '*', '✨': '*', '🌟': '*', '🎵': '*', '👋': '*',
+    '❌': 'X', '🌀': '@', '🌊': '~',
+})
+
+# fonts are discovered once per size and shared by every message
+_message_fonts = {}
+
+# the system font scan runs once, in the background when started early
+_font_scan = None
+
+def start_font_discovery(timings=None):
+    global _font_scan
+    if _font_scan is not None:
+        return
+
+    def scan():
+        start = time.perf_counter()
+        pygame.font.get_fonts()
+        if timings is not None:
+            timings["fonts"] = (time.perf_counter() - start) * 1000
+
+    _font_scan = threading.Thread(target=scan, name="font-scan", daemon=True)
+    _font_scan.start()
+
+def fonts_ready():
+    return _font_scan is None or not _font_scan.is_alive()
+
+def get_message_font(size=36):
+    font = _message_fonts.get(size)
+    if font is not None:
+        return font
+
+    print("\nTrying to load emoji fonts...")
+    for font_name in EMOJI_FONTS:
+        try:
+            font = pygame.font.SysFont(font_name, size)
+            # Test if font can render an emoji
+            font.render('😊', True, (255, 255, 255))
+            print(f"Successfully loaded {font_name}!")
+            break
+        except Exception as e:
+            print(f"Failed to load {font_name}: {str(e)}")
+            font = None
+    
+    # Fallback to default if no emoji font works
+    if font is None:
+        font = pygame.font.Font(None, size)
+    _message_fonts[size] = font
+    return font
+
+# rendered message text keyed by (text, color), shared between messages
+_text_surfaces = OrderedDict()
+
+def render_message_text(font, text, color, max_entries=64):
+    key = (text, color)
+    surface = _text_surfaces.get(key)
+    if surface is not None:
+        _text_surfaces.move_to_end(key)
+        return surface
+
+    try:
+        surface = font.render(text, True, color)
+    except Exception:
+        # If emoji fails, use simplified text
+        surface = font.render(text.translate(EMOJI_FALLBACKS), True, color)
+    _text_surfaces[key] = surface
+    if len(_text_surfaces) > max_entries:
+        _text_surfaces.popitem(last=False)
+    return surface
+
+def clear_message_caches():
+    # Fonts and surfaces die with pygame.quit(), a later game must not reuse them
+    _message_fonts.clear()
+    _text_surfaces.clear()
 
 # message class to display text on screen
 class Message:
-    def __init__(self, text, duration=2000):  # duration in milliseconds
+    __slots__ = ("text", "clock", "creation_time", "duration", "font", "color", "alpha",
+                 "y_offset", "surface")
+
+    def __init__(self, text, duration=2000, clock=pygame.time.get_ticks):  # duration in milliseconds
+        self.reset(text, duration, clock)
+
+    def reset(self, text, duration=2000, clock=pygame.time.get_ticks):
         self.text = text
-        self.creation_time = pygame.time.get_ticks()
+        self.clock = clock
+        self.creation_time = clock()
         self.duration = duration
-        
-        # make a font library for emoji support
-        emoji_fonts = ['Apple Color Emoji', 'Noto Color Emoji','Segoe UI Emoji', 'Arial Unicode MS', 'Arial']
         self.font = None
         
-        print("\nTrying to load emoji fonts...")
-        for font_name in emoji_fonts:
-            try:
-                self.font = pygame.font.SysFont(font_name, 36)
-                # Test if font can render an emoji
-                test = self.font.render('😊', True, (255, 255, 255))
-                print(f"Successfully loaded {font_name}!")
-                break
-            except Exception as e:
-                print(f"Failed to load {font_name}: {str(e)}")
-                continue
-        
-        # Fallback to default if no emoji font works
-        if self.font is None:
-            self.font = pygame.font.Font(None, 36)
-        
         self.color = (255, 255, 255)  # White text
         self.alpha = 255  # For fade out effect
         self.y_offset = 0  # Each message will get its own y-offset
-        
+        # Rendered once, only the alpha changes while the message is shown.
+        # Until the font scan finishes the message waits instead of blocking the frame.
+        self.surface = None
+        if fonts_ready():
+            self.render()
+
+    def render(self):
+        self.font = get_message_font(36)
+        self.surface = render_message_text(self.font, self.text, self.color)
+
 
     def is_expired(self):
-        current_time = pygame.time.get_ticks()
+        current_time = self.clock()
         return current_time - self.creation_time > self.duration
 
     def draw(self, screen):
-        current_time = pygame.time.get_ticks()
+        if self.surface is None:
+            if not fonts_ready():
+                return None
+            self.render()
+        current_time = self.clock()
         elapsed_time = current_time - self.creation_time
         time_left = self.duration - elapsed_time
         
@@ -51,35 +276,29 @@ class Message:
         if time_left < 500:
             self.alpha = max(0, min(255, int((time_left / 500) * 255)))
         
-        try:
-            text_surface = self.font.render(self.text, True, self.color)
-        except:
-            # If emoji fails, use simplified text
-            simplified_text = (self.text.replace('🌬', '*')
-                             .replace('✨', '*')
-                             .replace('🌟', '*')
-                             .replace('🎵', '*')
-                             .replace('👋', '*')
-                             .replace('❌', 'X')
-                             .replace('🌀', '@')
-                             .replace('🌊', '~'))
-            text_surface = self.font.render(simplified_text, True, self.color)
-        
+        text_surface = self.surface
         text_surface.set_alpha(self.alpha)
         
         # Position the text at the top center of the screen
         x = (screen.get_width() - text_surface.get_width()) // 2
         y = 20 + self.y_offset  # Offset each message vertically
-        screen.blit(text_surface, (x, y))
+        return screen.blit(text_surface, (x, y))
 
 # class to create blow effect
 class BlowEffect:
-    def __init__(self, x, y):
+    __slots__ = ("x", "y", "radius", "max_radius", "owns_particles", "particles", "lifetime")
+
+    def __init__(self, x, y, particles=None):
+        self.reset(x, y, particles)
+
+    def reset(self, x, y, particles=None):
         self.x = x
         self.y = y
         self.radius = 0
         self.max_radius = 100
-        self.particles = []
+        # Particles go to the shared system when one is given, otherwise to a small private one
+        self.owns_particles = particles is None
+        self.particles = ParticleSystem(capacity=64) if particles is None else particles
         self.lifetime = 30
 
     def update(self):
@@ -88,267 +307,1709 @@ class BlowEffect:
         
         # Add new particles
         if self.lifetime > 15:  # Only add particles in first half of animation
-            for _ in range(3):
-                angle = random.uniform(0, math.pi)
-                speed = random.uniform(2, 5)
-                self.particles.append({
-                    'x': self.x,
-                    'y': self.y,
-                    'dx': math.cos(angle) * speed,
-                    'dy': -math.sin(angle) * speed,
-                    'life': random.randint(10, 20)
-                })
-        
-        # Update existing particles
-        for particle in self.particles:
-            particle['x'] += particle['dx']
-            particle['y'] += particle['dy']
-            particle['life'] -= 1
+            self.particles.emit_blow(self.x, self.y, 3)
         
-        self.particles = [p for p in self.particles if p['life'] > 0]
+        if self.owns_particles:
+            self.particles.step()
         
         return self.lifetime > 0
 
-    def draw(self, screen):
-        # Draw expanding circles
+    def draw(self, screen, blend=1.0):
+        # Draw expanding circles, blend interpolates from the previous step
+        screen = as_renderer(screen)
+        radius = int(self.radius - 8 * (1 - blend))
         alpha = int(255 * (self.lifetime / 30))
-        surface = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(surface, (255, 255, 255, alpha), (self.radius, self.radius), self.radius, 2)
-        screen.blit(surface, (self.x - self.radius, self.y - self.radius))
+        rects = [screen.circle((self.x, self.y), radius, (255, 255, 255), alpha, width=2)]
         
-        # Draw particles
-        for particle in self.particles:
-            alpha = int(255 * (particle['life'] / 20))
-            pygame.draw.circle(screen, (200, 200, 255, alpha), 
-                             (int(particle['x']), int(particle['y'])), 2)
-
-# class to create bubble particles
-class BubbleParticle:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.dx = random.uniform(-3, 3)
-        self.dy = random.uniform(-3, 3)
-        self.lifetime = 60
-        self.color = color
-        self.radius = random.randint(2, 4)
+        if self.owns_particles:
+            rects += self.particles.draw(screen, blend)
+        return rects
 
-    def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.lifetime -= 2
-        self.radius *= 0.95
+# shared fixed-capacity particle system - every particle is stepped with one array update
+class ParticleSystem:
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+    def __init__(self, capacity=4096, overflow="drop_oldest", rng=None):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.capacity = capacity
+        self.overflow = overflow
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.head = 0  # next ring slot to write, always the oldest emission
+        self.dropped = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)  # positions before the last step, for interpolation
+        self.prev_y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.lifetime = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.decay = np.zeros(capacity)  # lifetime lost per step
+        self.shrink = np.ones(capacity)  # radius multiplier per step
+        self.alpha_scale = np.zeros(capacity)  # alpha = lifetime * alpha_scale
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
 
-# class to create bubbles
+    def __len__(self):
+        return int(np.count_nonzero(self.lifetime > 0))
+
+    def _claim(self, n):
+        if self.overflow == "drop_oldest":
+            # Ring buffer: overwrite whatever was emitted longest ago
+            n_kept = min(n, self.capacity)
+            slots = (self.head + np.arange(n_kept)) % self.capacity
+            self.dropped += int(np.count_nonzero(self.lifetime[slots] > 0)) + n - n_kept
+            self.head = (self.head + n_kept) % self.capacity
+        else:
+            # Only reuse retired slots, reject what does not fit
+            slots = np.flatnonzero(self.lifetime <= 0)[:n]
+            self.dropped += n - len(slots)
+        return slots, n - len(slots)
+
+    def emit(self, x, y, dx, dy, lifetime, radius, color, decay=2, shrink=0.95, alpha_scale=3):
+        n = len(dx)
+        slots, skip = self._claim(n)
+        if self.overflow == "drop_oldest":
+            source = slice(skip, n)  # keep the newest particles of an oversized batch
+        else:
+            source = slice(0, len(slots))
+        self.x[slots] = self.prev_x[slots] = np.broadcast_to(x, n)[source]
+        self.y[slots] = self.prev_y[slots] = np.broadcast_to(y, n)[source]
+        self.dx[slots] = dx[source]
+        self.dy[slots] = dy[source]
+        self.lifetime[slots] = np.broadcast_to(lifetime, n)[source]
+        self.radius[slots] = np.broadcast_to(radius, n)[source]
+        self.decay[slots] = decay
+        self.shrink[slots] = shrink
+        self.alpha_scale[slots] = alpha_scale
+        self.color[slots] = color[:3]
+        return len(slots)
+
+    def emit_burst(self, x, y, color, count=15):
+        # Each particle flies off in a random direction, fading and shrinking over 30 steps
+        rng = self.rng
+        return self.emit(x, y,
+                         rng.uniform(-3, 3, count), rng.uniform(-3, 3, count),
+                         60, rng.integers(2, 5, count), color)
+
+    def emit_blow(self, x, y, count=3):
+        rng = self.rng
+        angle = rng.uniform(0, math.pi, count)
+        speed = rng.uniform(2, 5, count)
+        return self.emit(x, y, np.cos(angle) * speed, -np.sin(angle) * speed,
+                         rng.integers(10, 21, count), 2, (200, 200, 255),
+                         decay=1, shrink=1.0, alpha_scale=255 / 20)
+
+    def step(self):
+        live = self.lifetime > 0
+        np.copyto(self.prev_x, self.x)
+        np.copyto(self.prev_y, self.y)
+        np.add(self.x, self.dx, out=self.x, where=live)
+        np.add(self.y, self.dy, out=self.y, where=live)
+        np.subtract(self.lifetime, self.decay, out=self.lifetime, where=live)
+        np.multiply(self.radius, self.shrink, out=self.radius, where=live)
+
+    def draw(self, screen, blend=1.0):
+        screen = as_renderer(screen)
+        live = np.flatnonzero(self.lifetime > 0)
+        xs, ys = self.x[live], self.y[live]
+        if blend < 1.0:
+            xs = self.prev_x[live] + (xs - self.prev_x[live]) * blend
+            ys = self.prev_y[live] + (ys - self.prev_y[live]) * blend
+        rects = []
+        for i, x, y in zip(live, xs, ys):
+            radius = int(self.radius[i])
+            alpha = self.lifetime[i] * self.alpha_scale[i]
+            rects.append(screen.circle((x, y), radius, self.color[i], alpha))
+        return rects
+
+# class to create bubbles - a thin view onto one bubble of a BubblePool.
+# Views are meant to be used until the pool's next step(): that compacts the arrays,
+# so the view has to find its bubble again by id, and raises once the bubble is gone.
+# Every field access goes through the pool arrays, so looping over views is far slower
+# than stepping the pool - the game never does it, it is here for old callers
 class Bubble:
+    __slots__ = ("pool", "id", "slot", "standalone")
+
     def __init__(self, x, y, screen_width, screen_height):
-        self.x = x
-        self.y = y
-        self.radius = random.randint(15, 35)
-        self.dx = random.uniform(-2, 2)
-        self.dy = random.uniform(-3, -1)
-        self.color = (
-            random.randint(100, 255),
-            random.randint(100, 255),
-            random.randint(200, 255),
-            random.randint(100, 200),
-        )
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.lifetime = 255
-        self.wobble_phase = random.uniform(0, 2 * math.pi)
-        self.wobble_speed = random.uniform(0.05, 0.1)
-        self.burst = False
-        self.particles = []
+        # A standalone bubble gets its own single-slot pool and particle system
+        pool = BubblePool(screen_width, screen_height, capacity=1)
+        self.reset(pool, pool.spawn_slot(x, y))
+        self.standalone = True
 
-    def move(self):
-        if self.burst:
-            for particle in self.particles:
-                particle.update()
-            self.particles = [p for p in self.particles if p.lifetime > 0]
-            return len(self.particles) > 0
-
-        self.x += self.dx
-        self.y += self.dy
-        self.dy += 0.02
-        self.lifetime -= 1
+    def reset(self, pool, index):
+        self.pool = pool
+        self.id = int(pool.ids[index])
+        self.slot = index
+        self.standalone = False
+
+    @property
+    def index(self):
+        pool, slot = self.pool, self.slot
+        if slot < pool.count and pool.ids[slot] == self.id:
+            return slot
+        # Compaction keeps the order and ids only grow, so the ids stay sorted
+        slot = int(np.searchsorted(pool.ids[:pool.count], self.id))
+        if slot == pool.count or pool.ids[slot] != self.id:
+            raise ReferenceError(f"Bubble {self.id} is no longer in the pool")
+        self.slot = slot
+        return slot
+
+    @classmethod
+    def view(cls, pool, index):
+        bubble = cls.__new__(cls)
+        bubble.reset(pool, index)
+        return bubble
+
+    def _field(name):
+        def get(self):
+            return getattr(self.pool, name)[self.index].item()
+
+        def set(self, value):
+            getattr(self.pool, name)[self.index] = value
+            self.pool.version += 1
 
-        self.wobble_phase += self.wobble_speed
-        self.dx += math.sin(self.wobble_phase) * 0.1
+        return property(get, set)
 
-        if self.x - self.radius <= 0 or self.x + self.radius >= self.screen_width:
-            self.dx *= -0.8
+    x = _field("x")
+    y = _field("y")
+    dx = _field("dx")
+    dy = _field("dy")
+    radius = _field("radius")
+    lifetime = _field("lifetime")
+    wobble_phase = _field("wobble_phase")
+    wobble_speed = _field("wobble_speed")
+    burst = _field("burst")
+    del _field
 
-        return self.lifetime > 0 and self.y + self.radius > 0
+    @property
+    def color(self):
+        return tuple(int(c) for c in self.pool.color[self.index])
+
+    @color.setter
+    def color(self, value):
+        self.pool.color[self.index] = value
+
+    @property
+    def screen_width(self):
+        return self.pool.screen_width
+
+    @property
+    def screen_height(self):
+        return self.pool.screen_height
+
+    def move(self):
+        pool, index = self.pool, self.index
+        if self.standalone and pool.burst[index]:
+            # Nobody else steps our private particles - live on until they have faded
+            pool.particles.step()
+            return len(pool.particles) > 0
+        return pool.step_slot(index)
 
     def burst_bubble(self):
-        self.burst = True
-        
-        # Play pop sound
-        pygame.mixer.Channel(0).play(pygame.mixer.Sound("pop.wav"))
-        
-        for _ in range(15):
-            self.particles.append(BubbleParticle(self.x, self.y, self.color))
-    
+        self.pool.burst_slot(self.index)
+        if self.standalone and mixer.get_init() is not None:
+            # No sound bank flushes pops for a standalone bubble, so play it right away
+            try:
+                sound = pygame.mixer.Sound(str(Path(__file__).resolve().parent / "pop.wav"))
+                pygame.mixer.Channel(0).play(sound)
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Sound error: {e}")
+
     #add wind motion to bubbles
     def apply_wind(self, force_x, force_y):
         self.dx += force_x
         self.dy += force_y
 
     def draw(self, screen):
-        if self.burst:
-            for particle in self.particles:
-                color = (*self.color[:3], int(particle.lifetime * 3))
-                surface = pygame.Surface((particle.radius * 2, particle.radius * 2), pygame.SRCALPHA)
-                pygame.draw.circle(surface, color, (particle.radius, particle.radius), particle.radius)
-                screen.blit(surface, (particle.x - particle.radius, particle.y - particle.radius))
+        pool, index = self.pool, self.index
+        if self.standalone and pool.burst[index]:
+            return pool.particles.draw(screen)
+        return pool.draw_slot(screen, index)
+
+def integrate_bubbles(pool, lo, hi, screen_width):
+    # Same per-bubble physics as before, applied to a whole slice at once.
+    # Works on anything with the BubblePool arrays, so shard workers can share it
+    x, y = pool.x[lo:hi], pool.y[lo:hi]
+    dx, dy = pool.dx[lo:hi], pool.dy[lo:hi]
+    radius = pool.radius[lo:hi]
+    lifetime = pool.lifetime[lo:hi]
+    phase = pool.wobble_phase[lo:hi]
+    live = ~pool.burst[lo:hi]
+
+    np.copyto(pool.prev_x[lo:hi], x)
+    np.copyto(pool.prev_y[lo:hi], y)
+    np.add(x, dx, out=x, where=live)
+    np.add(y, dy, out=y, where=live)
+    np.add(dy, 0.02, out=dy, where=live)
+    np.subtract(lifetime, 1, out=lifetime, where=live)
+
+    np.add(phase, pool.wobble_speed[lo:hi], out=phase, where=live)
+    np.add(dx, np.sin(phase) * 0.1, out=dx, where=live)
+
+    bounce = live & ((x - radius <= 0) | (x + radius >= screen_width))
+    np.multiply(dx, -0.8, out=dx, where=bounce)
+
+    return live & (lifetime > 0) & (y + radius > 0)
+
+# structure-of-arrays bubble store - every bubble is stepped with one vectorized update
+class BubblePool:
+    FIELDS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("prev_x", np.float64),  # positions before the last step, for interpolation
+        ("prev_y", np.float64),
+        ("dx", np.float64),
+        ("dy", np.float64),
+        ("radius", np.int32),
+        ("lifetime", np.int32),
+        ("wobble_phase", np.float64),
+        ("wobble_speed", np.float64),
+        ("burst", np.bool_),
+        ("ids", np.int64),
+    )
+
+    def __init__(self, screen_width, screen_height, capacity=256, rng=random, particles=None,
+                 sounds=None, batch_rng=None):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.rng = rng
+        # spawn_batch() draws whole arrays, so it needs a NumPy generator
+        self.batch_rng = np.random.default_rng() if batch_rng is None else batch_rng
+        self.count = 0
+        self.capacity = 0
+        self.next_id = 0
+        # Burst bubbles hand their particles to the (usually shared) particle system
+        self.particles = ParticleSystem(capacity=256) if particles is None else particles
+        self.sounds = sounds
+        self.burst_particles = 15
+        self.shimmer = True
+        self._grow(max(1, capacity))
+        self.version = 0  # bumped whenever positions change, keeps the grid honest
+        self.grid = SpatialGrid(screen_width, screen_height)
+        self._grid_version = -1
+
+    def _grow(self, capacity):
+        for name, dtype in self.FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        color = np.zeros((capacity, 4), dtype=np.uint8)
+        if self.capacity:
+            color[:self.count] = self.color[:self.count]
+        self.color = color
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield Bubble.view(self, i)
+
+    def spawn_slot(self, x, y):
+        if self.count == self.capacity:
+            self._grow(self.capacity * 2)
+        i = self.count
+        rng = self.rng
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.radius[i] = rng.randint(15, 35)
+        self.dx[i] = rng.uniform(-2, 2)
+        self.dy[i] = rng.uniform(-3, -1)
+        self.color[i] = (
+            rng.randint(100, 255),
+            rng.randint(100, 255),
+            rng.randint(200, 255),
+            rng.randint(100, 200),
+        )
+        self.lifetime[i] = 255
+        self.wobble_phase[i] = rng.uniform(0, 2 * math.pi)
+        self.wobble_speed[i] = rng.uniform(0.05, 0.1)
+        self.burst[i] = False
+        self.ids[i] = self.next_id
+        self.next_id += 1
+        self.count += 1
+        self.version += 1
+        return i
+
+    def spawn_batch(self, x, y, dx, dy, radius, color):
+        # Bulk insert: each field of all n new bubbles is written with one slice assignment
+        n = len(dx)
+        if self.count + n > self.capacity:
+            capacity = self.capacity
+            while capacity < self.count + n:
+                capacity *= 2
+            self._grow(capacity)
+        new = slice(self.count, self.count + n)
+        self.x[new] = self.prev_x[new] = x
+        self.y[new] = self.prev_y[new] = y
+        self.dx[new] = dx
+        self.dy[new] = dy
+        self.radius[new] = radius
+        self.color[new] = color
+        self.lifetime[new] = 255
+        self.wobble_phase[new] = self.batch_rng.uniform(0, 2 * math.pi, n)
+        self.wobble_speed[new] = self.batch_rng.uniform(0.05, 0.1, n)
+        self.burst[new] = False
+        self.ids[new] = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        self.count += n
+        self.version += 1
+        return range(new.start, new.stop)
+
+    def spawn(self, x, y):
+        return Bubble.view(self, self.spawn_slot(x, y))
+
+    def _integrate(self, lo, hi):
+        return integrate_bubbles(self, lo, hi, self.screen_width)
+
+    def step_slot(self, index):
+        return bool(self._integrate(index, index + 1)[0])
+
+    def step(self):
+        # Step every bubble, then compact the survivors to the front of the arrays
+        return self._compact(self._integrate(0, self.count))
+
+    def _compact(self, alive):
+        self.version += 1
+        keep = int(np.count_nonzero(alive))
+        if keep < self.count:
+            for name, _ in self.FIELDS:
+                array = getattr(self, name)
+                array[:keep] = array[:self.count][alive]
+            self.color[:keep] = self.color[:self.count][alive]
+            self.count = keep
+        return self.count
+
+    def apply_wind(self, force_x, force_y):
+        live = ~self.burst[:self.count]
+        np.add(self.dx[:self.count], force_x, out=self.dx[:self.count], where=live)
+        np.add(self.dy[:self.count], force_y, out=self.dy[:self.count], where=live)
+
+    def burst_slot(self, index):
+        self.burst[index] = True
+
+        # Play pop sound - queued, the sound bank coalesces pops once per frame
+        if self.sounds is not None:
+            self.sounds.request_pop()
+
+        self.particles.emit_burst(self.x[index], self.y[index], self.color[index],
+                                  count=self.burst_particles)
+
+    def burst_slots(self, indices):
+        for i in indices:
+            if not self.burst[i]:
+                self.burst_slot(i)
+
+    def burst_all(self):
+        self.burst_slots(np.flatnonzero(~self.burst[:self.count]))
+
+    def spatial_index(self):
+        # Rebuilt at most once per change to the bubble positions
+        if self._grid_version != self.version:
+            self.grid.rebuild(self.x[:self.count], self.y[:self.count])
+            self._grid_version = self.version
+        return self.grid
+
+    def draw_slot(self, screen, index, x=None, y=None):
+        # Burst bubbles are drawn by their particle system
+        if self.burst[index]:
+            return None
+        x = self.x[index] if x is None else x
+        y = self.y[index] if y is None else y
+        return as_renderer(screen).bubble((x, y), int(self.radius[index]), self.color[index][:3],
+                             self.lifetime[index], self.wobble_phase[index], self.shimmer)
+
+    def draw(self, screen, blend=1.0):
+        # blend < 1 draws between the previous and current step
+        screen = as_renderer(screen)
+        xs, ys = self.x[:self.count], self.y[:self.count]
+        if blend < 1.0:
+            prev_x, prev_y = self.prev_x[:self.count], self.prev_y[:self.count]
+            xs = prev_x + (xs - prev_x) * blend
+            ys = prev_y + (ys - prev_y) * blend
+        rects = []
+        for i in range(self.count):
+            rect = self.draw_slot(screen, i, xs[i], ys[i])
+            if rect is not None:
+                rects.append(rect)
+        return rects
+
+    def close(self):
+        pass
+
+def shared_pool_layout(capacity):
+    # (name, dtype, shape, offset) for every array in one shared memory block
+    layout = []
+    offset = 0
+    arrays = BubblePool.FIELDS + (("alive", np.bool_),)
+    for name, dtype in arrays:
+        layout.append((name, dtype, (capacity,), offset))
+        offset += (np.dtype(dtype).itemsize * capacity + 7) // 8 * 8
+    layout.append(("color", np.uint8, (capacity, 4), offset))
+    offset += capacity * 4
+    return layout, offset
+
+def shared_pool_arrays(buffer, capacity):
+    layout, _ = shared_pool_layout(capacity)
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for name, dtype, shape, offset in layout}
+
+# per-worker attachment to the current shared block, reused until the pool grows
+_shard_attachment = {}
+
+def _attach_shared_pool(name, capacity):
+    cached = _shard_attachment.get("pool")
+    if cached is not None and cached[0] == name:
+        return cached[2]
+    if cached is not None:
+        cached[2].__dict__.clear()
+        cached[1].close()
+    # Workers share the parent's resource tracker, which unlinks the block if we crash
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = SimpleNamespace(**shared_pool_arrays(shm.buf, capacity))
+    _shard_attachment["pool"] = (name, shm, arrays)
+    return arrays
+
+def _step_shard(task):
+    name, capacity, lo, hi, screen_width, winds = task
+    pool = _attach_shared_pool(name, capacity)
+    # Wind queued since the last step, each for the bubbles that existed at the time
+    for force_x, force_y, count in winds:
+        end = min(hi, count)
+        if end > lo:
+            live = ~pool.burst[lo:end]
+            np.add(pool.dx[lo:end], force_x, out=pool.dx[lo:end], where=live)
+            np.add(pool.dy[lo:end], force_y, out=pool.dy[lo:end], where=live)
+    pool.alive[lo:hi] = integrate_bubbles(pool, lo, hi, screen_width)
+
+# bubble arrays in shared memory, stepped in shards by a process pool.
+# The main process spawns, bursts, compacts and draws; the workers only integrate.
+class ShardedBubblePool(BubblePool):
+    def __init__(self, screen_width, screen_height, capacity=4096, workers=None,
+                 min_shard=4096, **kwargs):
+        self.shm = None
+        self.retired = []
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.min_shard = min_shard
+        self.winds = []
+        super().__init__(screen_width, screen_height, capacity=capacity, **kwargs)
+        # spawn rather than fork - the parent has SDL and the camera thread running
+        context = multiprocessing.get_context("spawn")
+        self.executor = context.Pool(self.workers)
+
+    def _grow(self, capacity):
+        _, size = shared_pool_layout(capacity)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        arrays = shared_pool_arrays(shm.buf, capacity)
+        for name, array in arrays.items():
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        if self.shm is not None:
+            self._retire(self.shm)
+        self.shm = shm
+        self.capacity = capacity
+
+    def _retire(self, shm):
+        # Views of the old block (e.g. in the spatial grid) may still be around
+        shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            self.retired.append(shm)
+
+    def apply_wind(self, force_x, force_y):
+        # Batched and broadcast to the workers with the next step
+        self.winds.append((force_x, force_y, self.count))
+
+    def step(self):
+        count = self.count
+        if count < self.min_shard:
+            # Not worth the round trip - run the same shard step in-process
+            winds, self.winds = self.winds, []
+            for force_x, force_y, n in winds:
+                self._wind_prefix(force_x, force_y, n)
+            return self._compact(self._integrate(0, count))
+
+        bounds = np.linspace(0, count, min(self.workers, count // self.min_shard) + 1, dtype=int)
+        tasks = [(self.shm.name, self.capacity, int(lo), int(hi), self.screen_width, self.winds)
+                 for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self.winds = []
+        self.executor.map(_step_shard, tasks)
+        return self._compact(self.alive[:count])
+
+    def _wind_prefix(self, force_x, force_y, count):
+        live = ~self.burst[:count]
+        np.add(self.dx[:count], force_x, out=self.dx[:count], where=live)
+        np.add(self.dy[:count], force_y, out=self.dy[:count], where=live)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.terminate()
+            self.executor.join()
+            self.executor = None
+        if self.shm is not None:
+            for name, _, _, _ in shared_pool_layout(self.capacity)[0]:
+                setattr(self, name, None)
+            self.grid = SpatialGrid(self.screen_width, self.screen_height)
+            self.retired.append(self.shm)
+            self.shm.unlink()
+            self.shm = None
+        for shm in self.retired:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        self.retired = []
+
+# uniform grid over points (bubble centres) for rectangle and radius queries
+class SpatialGrid:
+    def __init__(self, width, height, cell_size=64):
+        self.cell_size = cell_size
+        self.cols = int(width // cell_size) + 1
+        self.rows = int(height // cell_size) + 1
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.starts = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+
+    def _cell(self, value, cells):
+        # Points off screen are kept in the edge cells
+        return np.clip((value // self.cell_size).astype(np.intp), 0, cells - 1)
+
+    def rebuild(self, x, y):
+        self.x = x
+        self.y = y
+        keys = self._cell(y, self.rows) * self.cols + self._cell(x, self.cols)
+        self.order = np.argsort(keys, kind="stable")
+        self.starts = np.searchsorted(keys[self.order], np.arange(self.cols * self.rows + 1))
+
+    def candidates(self, x0, y0, x1, y1):
+        # Indices of every point in the cells overlapping the box
+        col0, col1 = self._cell(np.array([x0, x1]), self.cols)
+        row0, row1 = self._cell(np.array([y0, y1]), self.rows)
+        chunks = []
+        for row in range(row0, row1 + 1):
+            first = self.starts[row * self.cols + col0]
+            last = self.starts[row * self.cols + col1 + 1]
+            if last > first:
+                chunks.append(self.order[first:last])
+        if not chunks:
+            return self.order[:0]
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def query_rect(self, x, y, w, h):
+        # Points strictly inside the rectangle
+        found = self.candidates(x, y, x + w, y + h)
+        px, py = self.x[found], self.y[found]
+        return found[(x < px) & (px < x + w) & (y < py) & (py < y + h)]
+
+    def query_radius(self, x, y, radius):
+        found = self.candidates(x - radius, y - radius, x + radius, y + radius)
+        return found[(self.x[found] - x) ** 2 + (self.y[found] - y) ** 2 <= radius * radius]
+
+# vertical gradient backgrounds, rendered once per resolution
+_backgrounds = {}
+
+def gradient_background(width, height):
+    background = _backgrounds.get((width, height))
+    if background is None:
+        shade = np.arange(height) / height
+        column = np.empty((height, 3), dtype=np.uint8)
+        column[:, 0] = (20 + shade * 20).astype(np.uint8)
+        column[:, 1] = (20 + shade * 20).astype(np.uint8)
+        column[:, 2] = (40 + shade * 40).astype(np.uint8)
+        pixels = np.broadcast_to(column, (width, height, 3))
+        background = pygame.surfarray.make_surface(np.ascontiguousarray(pixels))
+        if pygame.display.get_surface() is not None:
+            background = background.convert()
+        _backgrounds[(width, height)] = background
+    return background
+
+# pushes only the screen regions that changed since the last frame
+class DirtyRectRenderer:
+    def __init__(self, max_rects=256):
+        self.max_rects = max_rects  # beyond this a full flip is cheaper
+        self.previous = None  # None forces a full redraw
+
+    def clear(self, screen, background):
+        if self.previous is None:
+            screen.blit(background, (0, 0))
         else:
-            color = (*self.color[:3], int(self.lifetime))
-            surface = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
-            pygame.draw.circle(surface, color, (self.radius, self.radius), self.radius)
-            shimmer_pos = (
-                self.radius + math.cos(self.wobble_phase) * (self.radius * 0.3),
-                self.radius + math.sin(self.wobble_phase) * (self.radius * 0.3),
-            )
-            pygame.draw.circle(surface, (255, 255, 255, 100), shimmer_pos, self.radius * 0.2)
-            screen.blit(surface, (self.x - self.radius, self.y - self.radius))
+            for rect in self.previous:
+                screen.blit(background, rect, rect)
 
-class BubbleGame:
+    def present(self, rects):
+        if self.previous is None or len(rects) + len(self.previous) > self.max_rects:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + rects)
+        self.previous = rects
+
+    def invalidate(self):
+        self.previous = None
+
+# draws with cached sprite surfaces blitted onto the display surface
+class SoftwareRenderer:
+    name = "software"
+
+    def __init__(self, screen, sprites=None, dirty_rects=False):
+        self.screen = screen
+        self.sprites = sprite_cache if sprites is None else sprites
+        # Optional dirty-rect mode for low-power displays
+        self.dirty = DirtyRectRenderer() if dirty_rects else None
+
+    def get_width(self):
+        return self.screen.get_width()
+
+    def get_height(self):
+        return self.screen.get_height()
+
+    def clear(self, background):
+        if self.dirty is not None:
+            self.dirty.clear(self.screen, background)
+        else:
+            self.screen.blit(background, (0, 0))
+
+    def blit(self, surface, position):
+        return self.screen.blit(surface, position)
+
+    def circle(self, center, radius, rgb, alpha, width=0):
+        radius = int(radius)
+        surface = self.sprites.circle(radius, rgb, alpha, width)
+        return self.screen.blit(surface, (center[0] - radius, center[1] - radius))
+
+    def bubble(self, center, radius, rgb, alpha, phase, shimmer=True):
+        radius = int(radius)
+        surface = self.sprites.bubble(radius, rgb, alpha, phase, shimmer)
+        return self.screen.blit(surface, (center[0] - radius, center[1] - radius))
+
+    def present(self, rects):
+        if self.dirty is not None:
+            self.dirty.present(rects)
+        else:
+            pygame.display.flip()
+
+def as_renderer(screen):
+    # Plain surfaces still work for the draw methods, they get the software path
+    if isinstance(screen, pygame.Surface):
+        return SoftwareRenderer(screen)
+    return screen
+
+# draws with GPU textures - one white mask per circle size, tinted and faded per draw
+class TextureRenderer:
+    name = "sdl2"
+
+    def __init__(self, width, height, title, accelerated=True):
+        from pygame._sdl2 import video
+        self.video = video
+        self.window = video.Window(title, size=(width, height))
+        try:
+            # accelerated=-1 lets SDL pick its own software rasterizer too
+            self.renderer = video.Renderer(self.window, accelerated=1 if accelerated else -1)
+        except video.error as e:
+            # _sdl2 raises its own error type, not pygame.error
+            self.window.destroy()
+            raise pygame.error(str(e)) from e
+        self.masks = {}  # (radius, width) -> Texture
+        self.textures = weakref.WeakKeyDictionary()  # uploaded surfaces, freed with them
+
+    def get_width(self):
+        return self.window.size[0]
+
+    def get_height(self):
+        return self.window.size[1]
+
+    def clear(self, background):
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+        self.blit(background, (0, 0))
+
+    def blit(self, surface, position):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.video.Texture.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        # Messages fade by changing the surface alpha, so it is read on every draw
+        alpha = surface.get_alpha()
+        texture.alpha = 255 if alpha is None else alpha
+        rect = pygame.Rect(position, surface.get_size())
+        texture.draw(dstrect=rect)
+        return rect
+
+    def _mask(self, radius, width=0):
+        key = (radius, width)
+        texture = self.masks.get(key)
+        if texture is None:
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (255, 255, 255, 255), (radius, radius), radius, width)
+            texture = self.video.Texture.from_surface(self.renderer, surface)
+            texture.blend_mode = 1  # SDL_BLENDMODE_BLEND
+            self.masks[key] = texture
+        return texture
+
+    def circle(self, center, radius, rgb, alpha, width=0):
+        radius = int(radius)
+        rect = pygame.Rect(center[0] - radius, center[1] - radius, radius * 2, radius * 2)
+        if radius <= 0:
+            return rect
+        texture = self._mask(radius, width)
+        texture.color = tuple(int(c) for c in rgb)
+        texture.alpha = max(0, min(255, int(alpha)))
+        texture.draw(dstrect=rect)
+        return rect
+
+    def bubble(self, center, radius, rgb, alpha, phase, shimmer=True):
+        rect = self.circle(center, radius, rgb, alpha)
+        glint = int(radius * 0.2)
+        if shimmer and glint > 0:
+            # Unquantized phase, so the shimmer turns smoothly
+            x = center[0] + math.cos(phase) * (radius * 0.3)
+            y = center[1] + math.sin(phase) * (radius * 0.3)
+            self.circle((x, y), glint, (255, 255, 255), 100)
+        return rect
+
+    def present(self, rects):
+        self.renderer.present()
+
+RENDERERS = ("auto", "software", "sdl2")
+
+def create_renderer(kind, width, height, title, sprites=None, dirty_rects=False):
+    # "auto" wants a GPU renderer, "sdl2" takes any SDL renderer; both fall back to software
+    if kind not in RENDERERS:
+        raise ValueError(f"Unknown renderer: {kind}")
+    if kind != "software":
+        try:
+            return TextureRenderer(width, height, title, accelerated=kind == "auto")
+        except (ImportError, pygame.error) as e:
+            print(f"Texture renderer unavailable, drawing in software: {e}")
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption(title)
+    return SoftwareRenderer(screen, sprites, dirty_rects)
+
+# result of analysing one camera frame, in screen coordinates
+MotionResult = namedtuple("MotionResult", "frame_id vertical_motion hands timings")
+
+# one tracked hand; velocity is in screen pixels per camera frame
+Hand = namedtuple("Hand", "x y rect track_id vx vy")
+
+# keeps blob identities across frames by matching each blob to the nearest predicted track
+class HandTracker:
+    def __init__(self, max_distance=150, max_missed=5, position_gain=0.6, velocity_gain=0.4):
+        self.max_distance = max_distance  # screen pixels a hand may jump between updates
+        self.max_missed = max_missed  # camera frames a track survives without a blob
+        self.position_gain = position_gain
+        self.velocity_gain = velocity_gain
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.next_id = 0
+
+    def reset(self):
+        self.__init__(self.max_distance, self.max_missed, self.position_gain, self.velocity_gain)
+
+    def update(self, centres, elapsed=1):
+        # centres is an (n, 2) array in screen pixels, elapsed the camera frames since last time
+        predicted = self.position + self.velocity * elapsed
+        n, m = len(centres), len(self.ids)
+        track_of = np.full(n, -1)
+        if n and m:
+            distance = np.hypot(*(centres[:, None, :] - predicted[None, :, :]).transpose(2, 0, 1))
+            # Greedy: closest pairs first, each blob and track used once
+            taken = np.zeros(m, dtype=bool)
+            for flat in np.argsort(distance, axis=None):
+                blob, track = divmod(int(flat), m)
+                if distance[blob, track] > self.max_distance:
+                    break
+                if track_of[blob] < 0 and not taken[track]:
+                    track_of[blob] = track
+                    taken[track] = True
+
+        matched = track_of >= 0
+        tracks = track_of[matched]
+        # Alpha-beta filter: smoothed position, velocity corrected by the prediction error
+        error = centres[matched] - predicted[tracks]
+        self.position[tracks] = predicted[tracks] + self.position_gain * error
+        self.velocity[tracks] += self.velocity_gain * error / elapsed
+        self.missed += elapsed
+        self.missed[tracks] = 0
+
+        new = np.flatnonzero(~matched)
+        track_of[new] = np.arange(m, m + len(new))
+        self.ids = np.concatenate([self.ids, self.next_id + np.arange(len(new))])
+        self.next_id += len(new)
+        self.position = np.concatenate([self.position, centres[new]])
+        self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 2))])
+        self.missed = np.concatenate([self.missed, np.zeros(len(new), dtype=np.int64)])
+
+        result = (self.ids[track_of], self.position[track_of], self.velocity[track_of])
+        alive = self.missed <= self.max_missed
+        if not alive.all():
+            self.ids, self.position = self.ids[alive], self.position[alive]
+            self.velocity, self.missed = self.velocity[alive], self.missed[alive]
+        return result
+
+# frame differencing for blow and hand detection, runs on any thread
+class MotionAnalyzer:
+    # analysis scale and blur kernel for each quality level
+    QUALITY_PRESETS = {
+        "high": (1.0, 21),
+        "medium": (0.5, 11),
+        "low": (0.25, 5),
+    }
+    BLOW_ROI = 80  # side of the centre square watched for blowing
+    BLOW_BLUR = 21
+    BACKGROUND_RATE = 0.05  # weight of a new frame in the background where nothing moves
+    ABSORB_RATE = 0.01  # weight everywhere, so a hand held still fades in about 3 seconds
+    EXPOSURE_SAMPLE_STEP = 8  # every n-th pixel each way is sampled for the exposure shift
+    EXPOSURE_TOLERANCE = 10  # grey levels a pixel may differ from the shift and still agree
+
+    def __init__(self, screen_width, screen_height, quality="high", min_hand_area=2000):
+        load_cv2()
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.min_hand_area = min_hand_area  # in full-resolution camera pixels
+        self.frame_id = 0
+        self.analyze_every = 1  # analyse only every n-th frame to save CPU
+        self.frames_seen = 0
+        self.last_analyzed = 0
+        self.tracker = HandTracker()
+        self.buffers = {}  # preallocated per-stage images, see _buffer()
+        self.pending_quality = None
+        self._apply_quality(quality)
+
+    def set_quality(self, quality):
+        if quality not in self.QUALITY_PRESETS:
+            raise ValueError(f"Unknown motion quality: {quality}")
+        # Applied by the next analyze() call, so a camera thread never sees half a switch
+        self.pending_quality = quality
+
+    def _apply_quality(self, quality):
+        self.pending_quality = None
+        self.quality = quality
+        self.scale, self.blur_size = self.QUALITY_PRESETS[quality]
+        # Buffer sizes change with the scale, so start the background afresh
+        self.background = None
+        self.prev_roi = None
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        # Reused every frame, reallocated only when the camera or quality changes size
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def _blow_roi(self, gray):
+        # Blur a padded crop so the inner square matches a full-frame blur exactly
+        half = self.BLOW_ROI // 2
+        pad = self.BLOW_BLUR // 2
+        cy, cx = gray.shape[0] // 2, gray.shape[1] // 2
+        crop = gray[max(0, cy - half - pad):cy + half + pad, max(0, cx - half - pad):cx + half + pad]
+        blurred = cv2.GaussianBlur(crop, (self.BLOW_BLUR, self.BLOW_BLUR), 0,
+                                   dst=self._buffer("roi_blur", crop.shape))
+        top, left = cy - half - max(0, cy - half - pad), cx - half - max(0, cx - half - pad)
+        return blurred[top:top + self.BLOW_ROI, left:left + self.BLOW_ROI]
+
+    def _exposure_shift(self, frame_diff):
+        # Median of a sparse sample: unlike the mean it ignores anything covering
+        # less than half the frame, so a big hand cannot shift every other pixel
+        step = self.EXPOSURE_SAMPLE_STEP
+        sample = self._buffer("exposure_sample", frame_diff[::step, ::step].shape, np.float32)
+        np.copyto(sample, frame_diff[::step, ::step])
+        flat = sample.reshape(-1)
+        middle = flat.size // 2
+        flat.partition(middle)
+        shift = float(flat[middle])
+        # A real exposure change moves nearly every pixel by the same amount; when only
+        # about half the frame agrees it is something big moving, so leave it alone
+        agreeing = np.count_nonzero(np.abs(flat - shift) < self.EXPOSURE_TOLERANCE)
+        return shift if agreeing >= 0.75 * flat.size else 0.0
+
+    def _vertical_motion(self, roi):
+        # Mean absolute change between neighbouring rows of the centre's frame difference
+        center_region = cv2.absdiff(self.prev_roi, roi, dst=self._buffer("roi_diff", roi.shape))
+        np.copyto(self.prev_roi, roi)
+        rows = self._buffer("roi_rows", (roi.shape[0] - 1, roi.shape[1]), np.int16)
+        cv2.subtract(center_region[:-1], center_region[1:], dst=rows, dtype=cv2.CV_16S)
+        return cv2.norm(rows, cv2.NORM_L1) / rows.size
+
+    def analyze(self, frame):
+        self.frames_seen += 1
+        if self.frames_seen % self.analyze_every:
+            return None
+        if self.pending_quality is not None:
+            self._apply_quality(self.pending_quality)
+
+        timings = {}
+        start = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray", frame.shape[:2]))
+        roi = self._blow_roi(gray)
+        if self.scale < 1.0:
+            shape = (int(round(gray.shape[0] * self.scale)), int(round(gray.shape[1] * self.scale)))
+            small = cv2.resize(gray, shape[::-1], dst=self._buffer("small", shape),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        blurred = cv2.GaussianBlur(small, (self.blur_size, self.blur_size), 0,
+                                   dst=self._buffer("blurred", small.shape))
+        timings["blur"] = (time.perf_counter() - start) * 1000
+
+        if self.background is None:
+            self.background = self._buffer("background", blurred.shape, np.float32)
+            np.copyto(self.background, blurred)
+            self.prev_roi = self._buffer("prev_roi", roi.shape)
+            np.copyto(self.prev_roi, roi)
+            return None
+
+        # Detect blow - focus on vertical motion in center region
+        stage = time.perf_counter()
+        vertical_motion = self._vertical_motion(roi)
+
+        # Difference against the running-average background rather than just the last frame
+        frame_diff = cv2.subtract(blurred, self.background, dtype=cv2.CV_32F,
+                                  dst=self._buffer("frame_diff", blurred.shape, np.float32))
+        # Auto exposure shifts the whole picture at once, so take out that shift
+        cv2.absdiff(frame_diff, self._exposure_shift(frame_diff), dst=frame_diff)
+        timings["diff"] = (time.perf_counter() - stage) * 1000
+
+        # Detect hand motion - every blob's area, box and centroid in one pass
+        stage = time.perf_counter()
+        thresh = cv2.compare(frame_diff, 25, cv2.CMP_GT, dst=self._buffer("thresh", blurred.shape))
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(
+            thresh, labels=self._buffer("labels", blurred.shape, np.int32), connectivity=8)
+        timings["contours"] = (time.perf_counter() - stage) * 1000
+
+        # Learn the background only where nothing moved, so hands leave no ghosts,
+        # plus a slow blend everywhere so things that stop moving are absorbed
+        still = cv2.bitwise_not(thresh, dst=self._buffer("still", blurred.shape))
+        cv2.accumulateWeighted(blurred, self.background, self.BACKGROUND_RATE, mask=still)
+        cv2.accumulateWeighted(blurred, self.background, self.ABSORB_RATE)
+
+        # Scale coordinates from the analysis image straight to the screen
+        stage = time.perf_counter()
+        scale = np.array([self.screen_width / frame_diff.shape[1],
+                          self.screen_height / frame_diff.shape[0]])
+        min_area = self.min_hand_area * (frame_diff.shape[0] * frame_diff.shape[1]) / (
+            frame.shape[0] * frame.shape[1])
+        # Label 0 is the background
+        big = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] > min_area) + 1
+        rects = (stats[big, :4] * np.tile(scale, 2)).astype(int)
+        ids, centres, velocities = self.tracker.update(
+            centroids[big] * scale, self.frames_seen - self.last_analyzed)
+        self.last_analyzed = self.frames_seen
+        hands = [Hand(int(x), int(y), tuple(rect), int(track_id), vx, vy)
+                 for (x, y), rect, track_id, (vx, vy)
+                 in zip(centres.tolist(), rects.tolist(), ids.tolist(), velocities.tolist())]
+        timings["hands"] = (time.perf_counter() - stage) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        self.frame_id += 1
+        return MotionResult(self.frame_id, vertical_motion, hands, timings)
+
+# single-value mailbox: the writer replaces, the reader always sees the newest value
+class LatestSlot:
     def __init__(self):
-        pygame.init()
-        
+        self._value = None
+
+    def publish(self, value):
+        # A plain reference swap is atomic, so no lock is needed
+        self._value = value
+
+    def latest(self):
+        return self._value
+
+# background thread that reads the camera and publishes motion results
+class CameraWorker(threading.Thread):
+    def __init__(self, camera, analyzer):
+        super().__init__(name="camera-worker", daemon=True)
+        self.camera = camera
+        self.analyzer = analyzer
+        self.results = LatestSlot()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.camera.read()
+            capture_ms = (time.perf_counter() - start) * 1000
+            if not ret:
+                self._stop_event.wait(0.01)
+                continue
+            result = self.analyzer.analyze(frame)
+            if result is not None:
+                result.timings["capture"] = capture_ms
+                self.results.publish(result)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+# watches frame time and trades visual quality for speed to hold the target frame rate
+class QualityGovernor:
+    # Level 0 is full quality, every later level does less work per frame
+    LEVELS = (
+        {"name": "full", "max_stream": None, "burst_particles": 15, "shimmer": True,
+         "motion_quality": "high", "analyze_every": 1},
+        {"name": "reduced", "max_stream": 10, "burst_particles": 10, "shimmer": True,
+         "motion_quality": "medium", "analyze_every": 1},
+        {"name": "low", "max_stream": 8, "burst_particles": 8, "shimmer": False,
+         "motion_quality": "medium", "analyze_every": 2},
+        {"name": "minimal", "max_stream": 6, "burst_particles": 5, "shimmer": False,
+         "motion_quality": "low", "analyze_every": 3},
+    )
+
+    def __init__(self, target_fps=60, window=30, slow_ratio=0.9, fast_ratio=0.5, cooldown=60):
+        self.budget_ms = 1000 / target_fps
+        self.window = window
+        self.slow_ratio = slow_ratio  # step down when average work exceeds this share of budget
+        self.fast_ratio = fast_ratio  # step back up when it drops below this share
+        self.cooldown = cooldown  # frames to wait after a change before judging again
+        self.frame_ms = deque(maxlen=window)
+        self.level = 0
+        self.frames_since_change = 0
+        self.history = []  # (frame, old level name, new level name, average ms)
+        self.frame_index = 0
+
+    @property
+    def settings(self):
+        return self.LEVELS[self.level]
+
+    def set_level(self, level, average_ms=0.0):
+        level = max(0, min(len(self.LEVELS) - 1, level))
+        if level == self.level:
+            return False
+        old = self.settings["name"]
+        self.level = level
+        self.frame_ms.clear()
+        self.frames_since_change = 0
+        self.history.append((self.frame_index, old, self.settings["name"], average_ms))
+        print(f"Quality governor: {old} -> {self.settings['name']} "
+              f"(average frame {average_ms:.1f} ms, budget {self.budget_ms:.1f} ms)")
+        return True
+
+    def observe(self, frame_ms):
+        # Returns True when the level changed and the new settings should be applied
+        self.frame_index += 1
+        self.frames_since_change += 1
+        self.frame_ms.append(frame_ms)
+        if len(self.frame_ms) < self.window or self.frames_since_change < self.cooldown:
+            return False
+        average = sum(self.frame_ms) / len(self.frame_ms)
+        if average > self.budget_ms * self.slow_ratio:
+            return self.set_level(self.level + 1, average)
+        if average < self.budget_ms * self.fast_ratio:
+            return self.set_level(self.level - 1, average)
+        return False
+
+# per-phase frame timings over a rolling window, with an optional CSV/JSONL stream
+class FrameProfiler:
+    PHASES = ("events", "camera", "capture", "analysis", "bubble_update", "effect_update",
+              "background", "effect_draw", "bubble_draw", "message_draw", "flip", "total")
+    COUNTS = ("bubbles", "particles", "blow_effects", "trails")
+
+    def __init__(self, window=120):
+        self.window = window
+        self.samples = {name: deque(maxlen=window) for name in self.PHASES}
+        self.current = {}
+        self.frame_index = 0
+        self.frame_start = None
+        self.export_file = None
+        self.export_csv = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter_ns()
         try:
-            mixer.init()
-            print("Mixer initialized successfully.")
-        except Exception as e:
-            print(f"Error initializing mixer: {e}")
+            yield
+        finally:
+            self.record(name, (time.perf_counter_ns() - start) / 1e6)
+
+    def record(self, name, ms):
+        self.current[name] = self.current.get(name, 0.0) + ms
+
+    def begin_frame(self):
+        self.current = {}
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self, counts):
+        if self.frame_start is not None:
+            self.current["total"] = (time.perf_counter_ns() - self.frame_start) / 1e6
+        for name, ms in self.current.items():
+            self.samples[name].append(ms)
+        if self.export_file is not None:
+            self._export(counts)
+        self.frame_index += 1
+
+    def average(self, name):
+        samples = self.samples[name]
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def averages(self):
+        return {name: self.average(name) for name in self.PHASES if self.samples[name]}
+
+    def open_export(self, path):
+        # .csv gets a header row, anything else is written as one JSON object per line
+        self.export_csv = str(path).endswith(".csv")
+        self.export_file = open(path, "w", encoding="utf-8", newline="")
+        if self.export_csv:
+            self.export_file.write(",".join(("frame",) + self.PHASES + self.COUNTS) + "\n")
+
+    def _export(self, counts):
+        if self.export_csv:
+            row = [str(self.frame_index)]
+            row += [f"{self.current[name]:.4f}" if name in self.current else ""
+                    for name in self.PHASES]
+            row += [str(counts.get(name, "")) for name in self.COUNTS]
+            self.export_file.write(",".join(row) + "\n")
+        else:
+            record = {"frame": self.frame_index}
+            record.update({name: round(ms, 4) for name, ms in self.current.items()})
+            record.update(counts)
+            self.export_file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self.export_file is not None:
+            self.export_file.close()
+            self.export_file = None
+
+# toggleable on-screen overlay of profiler averages and object counts
+class PerformanceHud:
+    def __init__(self, profiler, refresh_frames=15):
+        self.profiler = profiler
+        self.refresh_frames = refresh_frames  # re-render text only every few frames
+        self.visible = False
+        self.font = None
+        self.surface = None
+        self.age = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.surface = None
+
+    def _render(self, counts):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        averages = self.profiler.averages()
+        frame_ms = averages.get("total", 0.0)
+        lines = [f"{1000 / frame_ms:5.1f} fps  {frame_ms:6.2f} ms" if frame_ms else "-- fps"]
+        lines += [f"{name:<13}{ms:6.2f} ms" for name, ms in averages.items() if name != "total"]
+        lines += [f"{name:<13}{count:6d}" for name, count in counts.items()]
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(text.get_width() for text in rendered) + 12
+        height = sum(text.get_height() for text in rendered) + 12
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = 6
+        for text in rendered:
+            surface.blit(text, (6, y))
+            y += text.get_height()
+        return surface
+
+    def draw(self, screen, counts):
+        if not self.visible:
+            return None
+        if self.surface is None or self.age >= self.refresh_frames:
+            self.surface = self._render(counts)
+            self.age = 0
+        self.age += 1
+        return screen.blit(self.surface, (10, screen.get_height() - self.surface.get_height() - 10))
+
+# all sound assets decoded once, played through a small voice allocator
+class SoundBank:
+    ASSETS = {
+        "pop": "pop.wav",
+        "blow": "bubbles2.wav",
+        "pop_soft": "bubble_pop.mp3",
+    }
+    VOLUME = 0.4  # Reduced volume to prevent it from being too loud
+    BLOW_CHANNEL = 0  # blowing gets its own channel so pops never cut it off
+
+    def __init__(self, asset_dir=None, channels=8, max_pops_per_frame=2):
+        asset_dir = Path(__file__).resolve().parent if asset_dir is None else Path(asset_dir)
+        self.max_pops_per_frame = max_pops_per_frame
+        self.sounds = {}
+        self.errors = []
+        self.pending_pops = 0
+        self.played = 0
+        self.coalesced = 0
+        self.enabled = mixer.get_init() is not None
+        if not self.enabled:
+            return
+
+        pygame.mixer.set_num_channels(channels)
+        self.voices = [pygame.mixer.Channel(i) for i in range(channels) if i != self.BLOW_CHANNEL]
+        self.voice_started = [0.0] * len(self.voices)
+        for name, filename in self.ASSETS.items():
+            try:
+                sound = pygame.mixer.Sound(str(asset_dir / filename))
+                sound.set_volume(self.VOLUME)
+                self.sounds[name] = sound
+            except Exception as e:
+                print(f"Sound error: {e}")  # This will help debug sound issues
+                self.errors.append(filename)
+
+    @property
+    def loaded(self):
+        return self.enabled and not self.errors
+
+    def _voice(self):
+        # A free voice if there is one, otherwise steal the one playing longest
+        for i, channel in enumerate(self.voices):
+            if not channel.get_busy():
+                break
+        else:
+            i = self.voice_started.index(min(self.voice_started))
+        self.voice_started[i] = time.perf_counter()
+        return self.voices[i]
+
+    def play(self, name, volume=1.0):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        if name == "blow":
+            channel = pygame.mixer.Channel(self.BLOW_CHANNEL)
+        else:
+            channel = self._voice()
+        channel.play(sound)
+        channel.set_volume(volume)
+        self.played += 1
+
+    def request_pop(self, count=1):
+        self.pending_pops += count
+
+    def flush(self):
+        # Pops requested this frame share a few voices, louder the more bubbles burst
+        count = self.pending_pops
+        if not count:
+            return
+        self.pending_pops = 0
+        voices = min(count, self.max_pops_per_frame)
+        self.coalesced += count - voices
+        volume = min(1.0, 0.6 + 0.1 * math.log2(count))
+        for i in range(voices):
+            self.play("pop" if i % 2 == 0 else "pop_soft", volume)
+
+# recorded input for headless runs: camera frames or motion results, plus key presses
+class InputTrace:
+    def __init__(self, frames=None, motion=None, keys=None):
+        self.frames = frames  # (n, height, width, 3) uint8 BGR frames, may be memory-mapped
+        self.motion = {} if motion is None else motion  # frame index -> MotionResult
+        self.keys = {} if keys is None else keys  # frame index -> list of pygame key codes
+
+    def __len__(self):
+        frames = 0 if self.frames is None else len(self.frames)
+        last_event = max([*self.motion, *self.keys], default=-1)
+        return max(frames, last_event + 1)
+
+    def keys_at(self, index):
+        return self.keys.get(index, ())
+
+    def motion_at(self, index):
+        return self.motion.get(index)
+
+    def frame_at(self, index):
+        if self.frames is None or index >= len(self.frames):
+            return None
+        return self.frames[index]
+
+    def record_key(self, index, key):
+        self.keys.setdefault(index, []).append(key)
+
+    def record_motion(self, index, result):
+        self.motion[index] = result
+
+    @classmethod
+    def load(cls, path):
+        # A trace is a directory with an optional frames.npy and an optional events.json
+        path = Path(path)
+        frames = None
+        if (path / "frames.npy").exists():
+            frames = np.load(path / "frames.npy", mmap_mode="r")
+        motion, keys = {}, {}
+        if (path / "events.json").exists():
+            events = json.loads((path / "events.json").read_text(encoding="utf-8"))
+            for index, names in events.get("keys", {}).items():
+                keys[int(index)] = [pygame.key.key_code(name) for name in names]
+            for index, event in events.get("motion", {}).items():
+                # Older traces store hands as [x, y, rect] with no tracking
+                hands = [Hand(hand[0], hand[1], tuple(hand[2]), *hand[3:]) if len(hand) == 6
+                         else Hand(hand[0], hand[1], tuple(hand[2]), -1, 0.0, 0.0)
+                         for hand in event["hands"]]
+                motion[int(index)] = MotionResult(int(index), event["vertical_motion"], hands, {})
+        return cls(frames, motion, keys)
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        if self.frames is not None:
+            np.save(path / "frames.npy", np.asarray(self.frames))
+        events = {
+            "keys": {str(i): [pygame.key.name(k) for k in keys] for i, keys in self.keys.items()},
+            "motion": {
+                str(i): {
+                    "vertical_motion": float(result.vertical_motion),
+                    "hands": [[x, y, list(rect), track_id, vx, vy]
+                              for x, y, rect, track_id, vx, vy in result.hands],
+                }
+                for i, result in self.motion.items()
+            },
+        }
+        (path / "events.json").write_text(json.dumps(events, indent=2), encoding="utf-8")
+
+# hue -> RGB lookup tables at full value, one per saturation
+_hue_tables = {}
+
+def hue_table(saturation, size=360):
+    table = _hue_tables.get((saturation, size))
+    if table is None:
+        # Standard HSV sectors at full value, truncated to bytes, for every hue at once
+        h = np.arange(size) / size * 6.0
+        f = h - np.floor(h)
+        value = np.ones(size)
+        candidates = np.stack([value, 1.0 - saturation * (1.0 - f), value * (1.0 - saturation),
+                               1.0 - saturation * f])  # v, t, p, q
+        sectors = np.array([(0, 1, 2), (3, 0, 2), (2, 0, 1), (2, 3, 0), (1, 2, 0), (0, 2, 3)])
+        order = sectors[h.astype(int) % 6]
+        table = (candidates[order, np.arange(size)[:, None]] * 255).astype(np.uint8)
+        _hue_tables[(saturation, size)] = table
+    return table
+
+def hue_colors(hue, saturation, alpha=200):
+    # RGBA rows for an array of hues in [0, 1), wrapping outside it
+    table = hue_table(saturation)
+    index = np.floor(np.asarray(hue) * len(table)).astype(int) % len(table)
+    colors = np.empty((len(index), 4), dtype=np.uint8)
+    colors[:, :3] = table[index]
+    colors[:, 3] = alpha
+    return colors
+
+# bubble stream patterns - each turns (x, y, count, rng) into arrays for a whole stream
+BubbleBatch = namedtuple("BubbleBatch", "x y dx dy radius color")
+BubblePattern = namedtuple("BubblePattern", "name generate key message")
+BUBBLE_PATTERNS = {}
+
+def register_pattern(name, key=None, message=None):
+    # Decorator, so a plugin adds a pattern and the key that selects it in one place
+    def register(generate):
+        BUBBLE_PATTERNS[name] = BubblePattern(name, generate, key, message)
+        return generate
+    return register
+
+@register_pattern("fountain", pygame.K_f, "🌬 Fountain pattern activated!")
+def fountain_pattern(x, y, count, rng):
+    angle = math.pi / 2 + math.pi / 3 * (rng.random(count) - 0.5)  # 60-degree spread
+    speed = rng.uniform(6, 9, count)
+    # Rainbow colors for fountain
+    return BubbleBatch(x, y, np.cos(angle) * speed, -np.sin(angle) * speed,
+                       rng.integers(10, 26, count), hue_colors(np.arange(count) / count, 0.8))
+
+@register_pattern("spiral", pygame.K_s, "🌀 Spiral pattern activated!")
+def spiral_pattern(x, y, count, rng):
+    angle = np.arange(count) / count * math.pi * 2
+    speed = rng.uniform(3, 6, count)
+    # Color gradient for spiral
+    return BubbleBatch(x, y, np.cos(angle) * speed, -np.sin(angle) * speed - 2,
+                       rng.integers(8, 21, count), hue_colors(np.arange(count) / count, 0.9))
+
+@register_pattern("wave", pygame.K_w, "🌊 Wave pattern activated!")
+def wave_pattern(x, y, count, rng):
+    base_speed = rng.uniform(4, 7)
+    phase = np.arange(count) / count * math.pi * 2
+    # Ocean colors for wave
+    return BubbleBatch(x, y, np.cos(phase) * 3, np.full(count, -base_speed),
+                       rng.integers(12, 29, count),
+                       hue_colors(0.5 + rng.uniform(-0.1, 0.1, count), 0.7))
+
+class BubbleGame:
+    def __init__(self, particle_capacity=4096, particle_overflow="drop_oldest",
+                 sprite_cache_bytes=32 * 1024 * 1024, dirty_rects=False, threaded_camera=True,
+                 motion_quality="high", headless=False, seed=None, trace=None, record_trace=None,
+                 profile_export=None, target_fps=60, adaptive_quality=None, sim_hz=60,
+                 max_catchup_steps=5, shards=0, renderer="auto"):
+        # Headless runs use dummy SDL drivers, a simulated clock and no real camera
+        self.headless = headless
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        self.frame_count = 0  # simulation steps taken so far
+        self.step_ms = 1000 / sim_hz  # the simulation always advances in steps of this size
+        self.max_catchup_steps = max_catchup_steps
+        self.rng = random if seed is None else random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.record_path = record_trace
+        self.recording = InputTrace() if record_trace else None
+        self.profiler = FrameProfiler()
+        if profile_export:
+            self.profiler.open_export(profile_export)
+        self.hud = PerformanceHud(self.profiler)
+        # Adapting to measured time would make headless runs unrepeatable, so it is off there
+        if adaptive_quality is None:
+            adaptive_quality = not headless
+        self.target_fps = target_fps
+        self.governor = QualityGovernor(target_fps) if adaptive_quality else None
+
+        # Staged startup: only what the first frame needs runs here, timed per subsystem
+        self.startup_begin = time.perf_counter()
+        self.startup_timings = {}  # subsystem -> milliseconds
+
+        with self.startup_phase("pygame"):
+            pygame.init()
+        # Key names in a saved trace need pygame initialised to map back to key codes
+        self.trace = InputTrace.load(trace) if isinstance(trace, (str, Path)) else trace
+        # Fonts are scanned in the background, messages render once that is done
+        start_font_discovery(self.startup_timings)
         
-        # set up sound channels
-        pygame.mixer.set_num_channels(8)
+        with self.startup_phase("mixer"):
+            try:
+                mixer.init()
+                print("Mixer initialized successfully.")
+            except Exception as e:
+                print(f"Error initializing mixer: {e}")
+        
+        # Decode every sound once and set up the sound channels
+        with self.startup_phase("sounds"):
+            self.sounds = SoundBank(channels=8)
 
         self.screen_width = 800
         self.screen_height = 600
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
-        pygame.display.set_caption("🌟 Bubble Blast Fun ✨")
+        with self.startup_phase("display"):
+            self.sprites = SpriteCache(max_bytes=sprite_cache_bytes)
+            # Headless runs have no GPU to look for, so "auto" goes straight to software there
+            if headless and renderer == "auto":
+                renderer = "software"
+            self.renderer = create_renderer(renderer, self.screen_width, self.screen_height,
+                                            "🌟 Bubble Blast Fun ✨", self.sprites, dirty_rects)
+            print(f"Drawing with the {self.renderer.name} renderer")
+            self.background = gradient_background(self.screen_width, self.screen_height)
         
-        self.startup_time = pygame.time.get_ticks()
+        self.startup_time = self.ticks()
         self.startup_delay = 2000  # 2 seconds delay
         self.first_blow = False # Flag to check if first blow has occurred
-        self.bubbles = []
+        with self.startup_phase("simulation"):
+            self.particles = ParticleSystem(capacity=particle_capacity,
+                                            overflow=particle_overflow, rng=self.np_rng)
+            # shards > 0 steps the bubbles in that many worker processes
+            pool_class = ShardedBubblePool if shards else BubblePool
+            pool_options = {"workers": shards} if shards else {}
+            self.bubbles = pool_class(self.screen_width, self.screen_height, rng=self.rng,
+                                      particles=self.particles, sounds=self.sounds,
+                                      batch_rng=self.np_rng, **pool_options)
         self.blow_effects = []
         self.hand_trails = []
         self.messages = []  # New list to store active messages
+        # Effects and messages live for a second or two, so they are recycled
+        self.effect_pool = FreeList(BlowEffect)
+        self.message_pool = FreeList(Message)
         self.running = True
-        self.motion_threshold = 20
-        self.prev_frame = None
+        self.motion_threshold = 0.5  # mean absolute row change of the blow region
+        self.min_swipe_speed = 0  # screen pixels per camera frame a hand must move to pop
+        self.trail_heads = {}  # track id -> last trail point
+        self.motion_analyzer = None
+        self.camera_worker = None
+        self.last_motion = None
         self.last_blow_time = 0
         self.blow_cooldown = 300
         self.current_pattern = "fountain"
         self.pattern_change_time = 0
         self.pattern_duration = 5000
 
-        # Load and set up sounds
-        try:
-            self.pop_sound = pygame.mixer.Sound("pop.wav")
-            self.blow_sound = pygame.mixer.Sound("bubbles2.wav") 
-            self.pop_sound.set_volume(0.4)  # Reduced volume to prevent it from being too loud
-            if hasattr(self, 'blow_sound'):
-                self.blow_sound.set_volume(0.4)
+        if self.sounds.loaded:
             self.add_message("🎵 Sounds loaded successfully!")
-        except Exception as e:
-            print(f"Sound error: {e}")  # This will help debug sound issues
+        else:
             self.add_message("Note: Sound files not found", duration=3000)
-            self.pop_sound = pygame.mixer.Sound(buffer=np.zeros(4410))
-            self.pop_sound.set_volume(0)
 
+        self.camera = None
+        self.camera_available = False
+        self.pending_camera = None
+        with self.startup_phase("camera_start"):
+            self.open_camera(threaded_camera, motion_quality)
+
+    @contextmanager
+    def startup_phase(self, name):
+        start = time.perf_counter()
         try:
+            yield
+        finally:
+            self.startup_timings[name] = (time.perf_counter() - start) * 1000
+
+    def open_camera(self, threaded_camera=True, motion_quality="high"):
+        self.threaded_camera = threaded_camera
+        self.motion_quality = motion_quality
+        if self.trace is not None or self.headless:
+            # Motion comes from the trace, frames are analysed on the main thread
+            self.camera = None
+            self.camera_available = self.trace is not None
+            if self.trace is not None and self.trace.frames is not None:
+                self.motion_analyzer = MotionAnalyzer(self.screen_width, self.screen_height,
+                                                      quality=motion_quality)
             self.cv2 = cv2
-            self.camera = cv2.VideoCapture(0)
-            if self.camera.isOpened():
-                self.camera_available = True
-                self.camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.75)
-                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                self.add_message("✨ Camera initialized! ✨")
-                self.add_message("🌬 Blow to create bubbles!", duration=3000)
-                self.add_message("👋 Wave hands to pop bubbles!", duration=3000)
+            return
+
+        # Importing OpenCV and opening a webcam can take seconds, so it happens off the
+        # main thread and check_camera_interaction() picks the result up when it is ready
+        self.pending_camera = LatestSlot()
+        self.camera_opener = threading.Thread(target=self._open_camera_device,
+                                              name="camera-open", daemon=True)
+        self.camera_opener.start()
+
+    def _open_camera_device(self):
+        start = time.perf_counter()
+        camera = None
+        try:
+            cv2 = load_cv2()
+            camera = cv2.VideoCapture(0)
+            if camera.isOpened():
+                camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.75)
+                camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            result = (camera, None)
+        except Exception as e:
+            # Always publish something, otherwise the game waits for the camera forever
+            if camera is not None:
+                camera.release()
+            result = (None, e)
+        self.startup_timings["camera"] = (time.perf_counter() - start) * 1000
+        self.pending_camera.publish(result)
+
+    def _finish_camera_open(self, result):
+        # Main thread: wire up the opened camera and tell the player
+        self.pending_camera = None
+        self.camera, error = result
+        print(f"Camera ready after {self.startup_timings['camera']:.0f} ms")
+        if error is not None:
+            self.cv2 = None
+            self.camera = None
+            self.camera_available = False
+            if isinstance(error, ImportError):
+                self.add_message("❌ CV2 not installed", duration=3000)
             else:
-                self.camera_available = False
+                print(f"Camera error: {error}")
                 self.add_message("❌ Camera not available", duration=3000)
-        except ImportError:
-            self.cv2 = None
+            return
+
+        self.cv2 = cv2
+        if self.camera.isOpened():
+            self.camera_available = True
+            self.motion_analyzer = MotionAnalyzer(self.screen_width, self.screen_height,
+                                                  quality=self.motion_quality)
+            # Catch up with any quality drop made while the camera was opening
+            if self.governor is not None and self.governor.level > 0:
+                self.apply_quality(self.governor.settings)
+            if self.threaded_camera:
+                self.camera_worker = CameraWorker(self.camera, self.motion_analyzer)
+                self.camera_worker.start()
+            self.add_message("✨ Camera initialized! ✨")
+            self.add_message("🌬 Blow to create bubbles!", duration=3000)
+            self.add_message("👋 Wave hands to pop bubbles!", duration=3000)
+        else:
             self.camera_available = False
-            self.add_message("❌ CV2 not installed", duration=3000)
+            self.add_message("❌ Camera not available", duration=3000)
 
     def add_message(self, text, duration=2000):
     # Calculate vertical offset based on existing messages
         y_offset = len(self.messages) * 40  # 40 pixels between messages
-        msg = Message(text, duration)
+        msg = self.message_pool.acquire(text, duration, clock=self.ticks)
         msg.y_offset = y_offset
         self.messages.append(msg)
 
+    def ticks(self):
+        # Milliseconds of game time, which advances with simulation steps only
+        return int(self.frame_count * self.step_ms)
+
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.running = False
-                elif event.key == pygame.K_SPACE:
-                    self.add_message("✨ All bubbles burst! ✨")
-                    
-                    pygame.mixer.Channel(2).play(self.pop_sound)
-                    for bubble in self.bubbles:
-                        if not bubble.burst:
-                            bubble.burst_bubble()
-                elif event.key == pygame.K_f:
-                    self.current_pattern = "fountain"
-                    self.add_message("🌬 Fountain pattern activated!")
-                elif event.key == pygame.K_s:
-                    self.current_pattern = "spiral"
-                    self.add_message("🌀 Spiral pattern activated!")
-                elif event.key == pygame.K_w:
-                    self.current_pattern = "wave"
-                    self.add_message("🌊 Wave pattern activated!")
+                self.handle_key(event.key)
+
+    def handle_key(self, key):
+        if self.recording is not None:
+            self.recording.record_key(self.frame_count, key)
+        if key == pygame.K_ESCAPE:
+            self.running = False
+        elif key == pygame.K_F3:
+            self.hud.toggle()
+        elif key == pygame.K_SPACE:
+            self.add_message("✨ All bubbles burst! ✨")
+            
+            self.sounds.play("pop")
+            self.bubbles.burst_all()
+        else:
+            # Every registered pattern can bring its own key
+            for pattern in BUBBLE_PATTERNS.values():
+                if pattern.key == key:
+                    self.current_pattern = pattern.name
+                    self.add_message(pattern.message or f"{pattern.name} pattern activated!")
+                    break
     
     def check_camera_interaction(self):
+        if self.pending_camera is not None:
+            result = self.pending_camera.latest()
+            if result is not None:
+                self._finish_camera_open(result)
         if not self.camera_available:
             return
 
-        ret, frame = self.camera.read()
-        if not ret:
-            return
-
-        gray = self.cv2.cvtColor(frame, self.cv2.COLOR_BGR2GRAY)
-        blurred = self.cv2.GaussianBlur(gray, (21, 21), 0)
+        # Update hand trails
+        self.hand_trails = [(x, y, life-1) for x, y, life in self.hand_trails if life > 0]
 
-        if self.prev_frame is None:
-            self.prev_frame = blurred
-            return
+        if self.trace is not None:
+            result = self.trace.motion_at(self.frame_count)
+            if result is None:
+                frame = self.trace.frame_at(self.frame_count)
+                if frame is None or self.motion_analyzer is None:
+                    return
+                result = self.motion_analyzer.analyze(np.asarray(frame))
+                if result is None:
+                    return
+        elif self.camera_worker is not None:
+            # Never wait on the camera, just pick up the newest finished result
+            result = self.camera_worker.results.latest()
+            if result is None or result is self.last_motion:
+                return
+        else:
+            start = time.perf_counter()
+            ret, frame = self.camera.read()
+            if not ret:
+                return
+            capture_ms = (time.perf_counter() - start) * 1000
+            result = self.motion_analyzer.analyze(frame)
+            if result is None:
+                return
+            result.timings["capture"] = capture_ms
+        self.last_motion = result
+        if "capture" in result.timings:
+            self.profiler.record("capture", result.timings["capture"])
+        if "total" in result.timings:
+            self.profiler.record("analysis", result.timings["total"])
+        if self.recording is not None:
+            self.recording.record_motion(self.frame_count, result)
+        self.apply_motion(result)
 
-        # Calculate frame difference
-        frame_diff = self.cv2.absdiff(self.prev_frame, blurred)
-        self.prev_frame = blurred
+    @property
+    def motion_timings(self):
+        # Per-stage milliseconds of the most recent analysed camera frame
+        return {} if self.last_motion is None else dict(self.last_motion.timings)
 
-        # Detect blow - focus on vertical motion in center region
-        center_region = frame_diff[frame_diff.shape[0]//2-40:frame_diff.shape[0]//2+40, 
-                                 frame_diff.shape[1]//2-40:frame_diff.shape[1]//2+40]
-        
-        # Calculate vertical motion (more sensitive to blowing)
-        vertical_motion = np.mean(center_region[:-1] - center_region[1:])
-        
-        current_time = pygame.time.get_ticks()
+    def apply_motion(self, result):
+        current_time = self.ticks()
         if (current_time - self.startup_time > self.startup_delay and 
-            vertical_motion > self.motion_threshold and 
+            result.vertical_motion > self.motion_threshold and 
             current_time - self.last_blow_time > self.blow_cooldown):
             
             self.first_blow = True # Set flag to True after first blow
             # Create blow effect
-            effect = BlowEffect(self.screen_width//2, self.screen_height - 50)
+            effect = self.effect_pool.acquire(self.screen_width//2, self.screen_height - 50,
+                                              self.particles)
             self.blow_effects.append(effect)
             
             # Play blow sound
-            pygame.mixer.Channel(1).play(self.blow_sound)
+            self.sounds.play("blow")
             
             # Create stream of bubbles with current pattern
             if self.first_blow:
@@ -356,171 +2017,297 @@ class BubbleGame:
                                         pattern=self.current_pattern, count=12)
             
             # Apply wind force to existing bubbles
-            wind_force_x = random.uniform(-3, 3)  # Random horizontal force
-            wind_force_y = random.uniform(-4, -2)  # Stronger upward force
-            for bubble in self.bubbles:
-                if not bubble.burst:
-                    bubble.apply_wind(wind_force_x, wind_force_y)
+            wind_force_x = self.rng.uniform(-3, 3)  # Random horizontal force
+            wind_force_y = self.rng.uniform(-4, -2)  # Stronger upward force
+            self.bubbles.apply_wind(wind_force_x, wind_force_y)
             
             self.add_message("🌬 Woosh!", duration=1000)
             self.last_blow_time = current_time
 
-        # Detect hand motion
-        _, thresh = self.cv2.threshold(frame_diff, 25, 255, self.cv2.THRESH_BINARY)
-        contours, _ = self.cv2.findContours(thresh, self.cv2.RETR_EXTERNAL, 
-                                          self.cv2.CHAIN_APPROX_SIMPLE)
+        trail_heads = {}
+        for x, y, (rx, ry, rw, rh), track_id, vx, vy in result.hands:
+            # Add to hand trails, filling the gap since this hand was last seen
+            head = self.trail_heads.get(track_id) if track_id >= 0 else None
+            if head is not None:
+                steps = min(int(math.hypot(x - head[0], y - head[1]) // 12), 8)
+                for k in range(1, steps + 1):
+                    t = k / (steps + 1)
+                    self.hand_trails.append((head[0] + (x - head[0]) * t,
+                                             head[1] + (y - head[1]) * t, 20))
+            self.hand_trails.append((x, y, 20))
+            trail_heads[track_id] = (x, y)
 
-        # Update hand trails
-        self.hand_trails = [(x, y, life-1) for x, y, life in self.hand_trails if life > 0]
+            # Slow movement (and camera noise) does not pop anything
+            if math.hypot(vx, vy) < self.min_swipe_speed:
+                continue
 
-        for contour in contours:
-            if self.cv2.contourArea(contour) > 2000:
-                M = self.cv2.moments(contour)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    
-                    # Scale coordinates to match screen
-                    x = int(cx * self.screen_width / frame.shape[1])
-                    y = int(cy * self.screen_height / frame.shape[0])
-                    
-                    # Add to hand trails
-                    self.hand_trails.append((x, y, 20))
-                    
-                    # Check for bubble collisions
-                    center_x = self.screen_width // 2
-                    center_y = self.screen_height // 2
-                    if abs(x - center_x) > 100 or abs(y - center_y) > 100:  # Ignore center region
-                        for bubble in self.bubbles:
-                            if not bubble.burst:
-                                x, y, w, h = self.cv2.boundingRect(contour)
-                                x = int(x * self.screen_width / frame.shape[1])
-                                y = int(y * self.screen_height / frame.shape[0])
-                                w = int(w * self.screen_width / frame.shape[1])
-                                h = int(h * self.screen_height / frame.shape[0])
-                                
-                                if x < bubble.x < x + w and y < bubble.y < y + h:
-                                    bubble.burst_bubble()
+            # Check for bubble collisions
+            center_x = self.screen_width // 2
+            center_y = self.screen_height // 2
+            if abs(x - center_x) > 100 or abs(y - center_y) > 100:  # Ignore center region
+                if head is not None:
+                    # Sweep the box back along the swipe so fast hands do not skip bubbles
+                    back_x, back_y = head[0] - x, head[1] - y
+                    rx, rw = rx + min(0, back_x), rw + abs(back_x)
+                    ry, rh = ry + min(0, back_y), rh + abs(back_y)
+                grid = self.bubbles.spatial_index()
+                self.bubbles.burst_slots(grid.query_rect(rx, ry, rw, rh))
+        self.trail_heads = trail_heads
 
     def update(self):
-        self.handle_events()
-        self.check_camera_interaction()
+        # One rendered frame's worth of input and one simulation step
+        with self.profiler.phase("events"):
+            self.handle_events()
+        self.step()
+
+    def step(self):
+        # Advance the simulation by exactly one fixed step
+        profiler = self.profiler
+        if self.trace is not None:
+            for key in self.trace.keys_at(self.frame_count):
+                self.handle_key(key)
+        with profiler.phase("camera"):
+            self.check_camera_interaction()
         
         # Update bubbles
-        self.bubbles = [bubble for bubble in self.bubbles if bubble.move()]
-        
-        # Update blow effects
-        self.blow_effects = [effect for effect in self.blow_effects if effect.update()]
+        with profiler.phase("bubble_update"):
+            self.bubbles.step()
         
-        # Update messages - remove expired ones
-        self.messages = [msg for msg in self.messages if not msg.is_expired()]
-
-    def draw(self):
-        # Create a gradient background
-        for i in range(self.screen_height):
-            color = (
-                int(20 + (i / self.screen_height) * 20),
-                int(20 + (i / self.screen_height) * 20),
-                int(40 + (i / self.screen_height) * 40)
-            )
-            pygame.draw.line(self.screen, color, (0, i), (self.screen_width, i))
+        with profiler.phase("effect_update"):
+            # Update blow effects, finished ones go back to their pool
+            active = []
+            for effect in self.blow_effects:
+                if effect.update():
+                    active.append(effect)
+                else:
+                    self.effect_pool.release(effect)
+            self.blow_effects = active
+            
+            # Update every burst and blow particle in one pass
+            self.particles.step()
+            
+            # Update messages - remove expired ones
+            active = []
+            for msg in self.messages:
+                if msg.is_expired():
+                    self.message_pool.release(msg)
+                else:
+                    active.append(msg)
+            self.messages = active
+            
+            # Play this frame's coalesced pops
+            self.sounds.flush()
+        self.frame_count += 1
 
-        # Draw hand trails
-        for x, y, life in self.hand_trails:
-            alpha = int(255 * (life / 20))
-            radius = int(20 * (life / 20))
-            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-            pygame.draw.circle(surface, (255, 255, 255, alpha), (radius, radius), radius)
-            self.screen.blit(surface, (x - radius, y - radius))
+    def object_counts(self):
+        return {
+            "bubbles": len(self.bubbles),
+            "particles": len(self.particles),
+            "blow_effects": len(self.blow_effects),
+            "trails": len(self.hand_trails),
+        }
+
+    def pool_stats(self):
+        return {
+            "blow_effects": self.effect_pool.stats(),
+            "messages": self.message_pool.stats(),
+        }
+
+    def draw(self, blend=1.0):
+        # blend is how far between the last two simulation steps to draw moving objects
+        profiler = self.profiler
+        screen = self.renderer
+        # Draw the cached gradient background
+        with profiler.phase("background"):
+            screen.clear(self.background)
+        rects = []
+
+        with profiler.phase("effect_draw"):
+            # Draw hand trails
+            for x, y, life in self.hand_trails:
+                alpha = int(255 * (life / 20))
+                radius = int(20 * (life / 20))
+                rects.append(screen.circle((x, y), radius, (255, 255, 255), alpha))
 
-        # Draw all effects
-        for effect in self.blow_effects:
-            effect.draw(self.screen)
+            # Draw all effects
+            for effect in self.blow_effects:
+                rects += effect.draw(screen, blend)
 
         # Draw all bubbles
-        for bubble in self.bubbles:
-            bubble.draw(self.screen)
+        with profiler.phase("bubble_draw"):
+            rects += self.bubbles.draw(screen, blend)
+            rects += self.particles.draw(screen, blend)
 
         # Draw all active messages
-        for message in self.messages:
-            message.draw(self.screen)
+        with profiler.phase("message_draw"):
+            for message in self.messages:
+                rect = message.draw(screen)
+                if rect is not None:
+                    rects.append(rect)
+            hud_rect = self.hud.draw(screen, self.object_counts())
+            if hud_rect is not None:
+                rects.append(hud_rect)
 
-        pygame.display.flip()
+        with profiler.phase("flip"):
+            screen.present(rects)
         
     def create_bubble_stream(self, x, y, pattern="fountain", count=1):
-        if pattern == "fountain":
-            # Create a fountain pattern
-            for i in range(count):
-                angle = math.pi/2 + math.pi/3 * (random.random() - 0.5)  # 60-degree spread
-                speed = random.uniform(6, 9)
-                bubble = Bubble(x, y, self.screen_width, self.screen_height)
-                bubble.dx = math.cos(angle) * speed
-                bubble.dy = -math.sin(angle) * speed
-                bubble.radius = random.randint(10, 25)
-                # Rainbow colors for fountain
-                hue = i / count
-                rgb = self.hsv_to_rgb(hue, 0.8, 1.0)
-                bubble.color = (*rgb, 200)
-                self.bubbles.append(bubble)
-        elif pattern == "spiral":
-            # Create a spiral pattern
-            for i in range(count):
-                angle = (i / count) * math.pi * 2
-                speed = random.uniform(3, 6)
-                bubble = Bubble(x, y, self.screen_width, self.screen_height)
-                bubble.dx = math.cos(angle) * speed
-                bubble.dy = -math.sin(angle) * speed - 2
-                bubble.radius = random.randint(8, 20)
-                # Color gradient for spiral
-                hue = i / count
-                rgb = self.hsv_to_rgb(hue, 0.9, 1.0)
-                bubble.color = (*rgb, 200)
-                self.bubbles.append(bubble)
-        elif pattern == "wave":
-            # Create a wave pattern
-            base_speed = random.uniform(4, 7)
-            for i in range(count):
-                phase = (i / count) * math.pi * 2
-                bubble = Bubble(x, y, self.screen_width, self.screen_height)
-                bubble.dx = math.cos(phase) * 3
-                bubble.dy = -base_speed
-                bubble.radius = random.randint(12, 28)
-                # Ocean colors for wave
-                rgb = self.hsv_to_rgb(0.5 + random.uniform(-0.1, 0.1), 0.7, 1.0)
-                bubble.color = (*rgb, 200)
-                self.bubbles.append(bubble)
+        if self.governor is not None and self.governor.settings["max_stream"] is not None:
+            count = min(count, self.governor.settings["max_stream"])
+        if pattern not in BUBBLE_PATTERNS:
+            raise ValueError(f"Unknown bubble pattern: {pattern}")
+        # The pattern builds the whole stream as arrays, the pool inserts it in one go
+        batch = BUBBLE_PATTERNS[pattern].generate(x, y, count, self.np_rng)
+        return self.bubbles.spawn_batch(*batch)
     
-    def hsv_to_rgb(self, h, s, v):
-        if s == 0.0:
-            return (v, v, v)
-        i = int(h * 6.0)
-        f = (h * 6.0) - i
-        p = v * (1.0 - s)
-        q = v * (1.0 - s * f)
-        t = v * (1.0 - s * (1.0 - f))
-        i = i % 6
-        v = int(v * 255)
-        t = int(t * 255)
-        p = int(p * 255)
-        q = int(q * 255)
-        if i == 0: return (v, t, p)
-        if i == 1: return (q, v, p)
-        if i == 2: return (p, v, t)
-        if i == 3: return (p, q, v)
-        if i == 4: return (t, p, v)
-        if i == 5: return (v, p, q)
+    def state_digest(self):
+        # Hash of the simulation state - equal digests mean bit-identical bubbles and particles
+        digest = hashlib.sha256()
+        count = self.bubbles.count
+        for name, _ in BubblePool.FIELDS:
+            digest.update(getattr(self.bubbles, name)[:count].tobytes())
+        digest.update(self.bubbles.color[:count].tobytes())
+        for array in (self.particles.x, self.particles.y, self.particles.lifetime,
+                      self.particles.radius):
+            digest.update(array.tobytes())
+        return digest.hexdigest()
 
-    def run(self):
+    def run_headless(self, frames=None, draw=False):
+        # Step as fast as possible for a fixed number of frames and report throughput
+        if frames is None:
+            frames = len(self.trace) if self.trace is not None else 600
+        start = time.perf_counter()
+        for _ in range(frames):
+            if not self.running:
+                break
+            self.profiler.begin_frame()
+            self.update()
+            if draw:
+                self.draw()
+            self.end_frame()
+        elapsed = time.perf_counter() - start
+        stats = {
+            "frames": self.frame_count,
+            "seconds": elapsed,
+            "fps": self.frame_count / elapsed if elapsed else float("inf"),
+            "bubbles": len(self.bubbles),
+            "particles": len(self.particles),
+            "object_pools": self.pool_stats(),
+            "startup_ms": dict(self.startup_timings),
+            "digest": self.state_digest(),
+        }
+        self.shutdown()
+        return stats
+
+    def run(self, uncapped=False):
+        # Fixed-timestep loop: the simulation runs at sim_hz whatever the render rate,
+        # uncapped renders and steps once per frame as fast as possible for benchmarking
         clock = pygame.time.Clock()
+        accumulator = 0.0
+        previous = time.perf_counter()
         while self.running:
-            self.update()
-            self.draw()
-            clock.tick(60)
+            now = time.perf_counter()
+            accumulator += (now - previous) * 1000
+            previous = now
 
-        if self.camera_available:
+            self.profiler.begin_frame()
+            with self.profiler.phase("events"):
+                self.handle_events()
+            if uncapped:
+                steps, accumulator = 1, 0.0
+            else:
+                steps = int(accumulator // self.step_ms)
+                if steps > self.max_catchup_steps:
+                    # Too far behind to catch up, drop the backlog rather than spiral
+                    steps = self.max_catchup_steps
+                    accumulator = 0.0
+                else:
+                    accumulator -= steps * self.step_ms
+            for _ in range(steps):
+                self.step()
+            self.draw(1.0 if uncapped else accumulator / self.step_ms)
+            self.end_frame()
+            clock.tick(0 if uncapped else self.target_fps)
+        self.shutdown()
+
+    def end_frame(self):
+        if "first_frame" not in self.startup_timings:
+            self.startup_timings["first_frame"] = (time.perf_counter() - self.startup_begin) * 1000
+            print("Startup: " + ", ".join(f"{name} {ms:.0f} ms"
+                                          for name, ms in list(self.startup_timings.items())))
+        self.profiler.end_frame(self.object_counts())
+        if self.governor is not None and self.governor.observe(self.profiler.current["total"]):
+            self.apply_quality(self.governor.settings)
+
+    def apply_quality(self, settings):
+        self.bubbles.burst_particles = settings["burst_particles"]
+        self.bubbles.shimmer = settings["shimmer"]
+        if self.motion_analyzer is not None:
+            self.motion_analyzer.set_quality(settings["motion_quality"])
+            self.motion_analyzer.analyze_every = settings["analyze_every"]
+
+    def shutdown(self):
+        if self.pending_camera is not None:
+            # Still opening - wait briefly so the device is not left open
+            self.camera_opener.join(timeout=2)
+            result = self.pending_camera.latest()
+            if result is not None and result[0] is not None:
+                result[0].release()
+        if self.camera_worker is not None:
+            self.camera_worker.stop()
+        if self.camera is not None:
             self.camera.release()
+        if self.recording is not None:
+            self.recording.save(self.record_path)
+            print(f"Input trace saved to {self.record_path}")
+        self.bubbles.close()
+        self.profiler.close()
+        print(f"Sprite cache: {self.sprites.stats()}")
+        print(f"Object pools: {self.pool_stats()}")
+        clear_message_caches()
         pygame.quit()
 
 if __name__ == "__main__":
-    game = BubbleGame()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bubble Blast Fun")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window or camera and report frames per second")
+    parser.add_argument("--frames", type=int, help="number of frames for a headless run")
+    parser.add_argument("--no-draw", action="store_true", help="skip drawing in a headless run")
+    parser.add_argument("--seed", type=int, help="seed for a repeatable run")
+    parser.add_argument("--trace", help="directory with a recorded input trace to replay")
+    parser.add_argument("--record", help="directory to save this session's input trace to")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only update the parts of the screen that changed")
+    parser.add_argument("--motion-quality", default="high",
+                        choices=sorted(MotionAnalyzer.QUALITY_PRESETS))
+    parser.add_argument("--sync-camera", action="store_true",
+                        help="read the camera on the main thread")
+    parser.add_argument("--fixed-quality", action="store_true",
+                        help="never lower quality to hold the frame rate")
+    parser.add_argument("--profile-out",
+                        help="stream per-frame timings to this .csv or .jsonl file")
+    parser.add_argument("--uncapped", action="store_true",
+                        help="render and step as fast as possible to measure throughput")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="step the bubbles in this many worker processes")
+    parser.add_argument("--renderer", default="auto", choices=RENDERERS,
+                        help="auto uses GPU textures when available, otherwise software blits")
+    parser.add_argument("--min-swipe-speed", type=float, default=0,
+                        help="pixels per camera frame a hand must move to pop bubbles")
+    parser.add_argument("--motion-threshold", type=float, default=0.5,
+                        help="blow strength needed to make bubbles, raise it for noisy cameras")
+    args = parser.parse_args()
+
+    game = BubbleGame(dirty_rects=args.dirty_rects, threaded_camera=not args.sync_camera,
+                      motion_quality=args.motion_quality, headless=args.headless,
+                      seed=args.seed, trace=args.trace, record_trace=args.record,
+                      profile_export=args.profile_out,
+                      adaptive_quality=False if args.fixed_quality else None,
+                      shards=args.shards, renderer=args.renderer)
+    game.min_swipe_speed = args.min_swipe_speed
+    game.motion_threshold = args.motion_threshold
+    if args.headless:
+        stats = game.run_headless(args.frames, draw=not args.no_draw)
+        print(json.dumps(stats, indent=2))
+    else:
+        game.run(uncapped=args.uncapped)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""Regression checks for the camera motion analysis in bubble_blast.py.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("cv2")
+
+import bubble_blast as bb
+
+SEED = 1234
+WIDTH, HEIGHT = 800, 600
+
+
+def still_frame(rng):
+    return rng.integers(50, 60, (480, 640, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("coverage", [0.1, 0.25, 0.4, 0.49])
+def test_occluder_is_one_hand(coverage):
+    # A bright region over part of a still scene must come back as exactly one hand,
+    # not also as the unchanged rest of the frame
+    rng = np.random.default_rng(SEED)
+    analyzer = bb.MotionAnalyzer(WIDTH, HEIGHT)
+    for _ in range(5):
+        analyzer.analyze(still_frame(rng))
+    frame = still_frame(rng)
+    frame[:, :int(640 * coverage)] = 200
+    hands = analyzer.analyze(frame).hands
+    assert len(hands) == 1, [(hand.x, hand.y, hand.rect) for hand in hands]
+    assert hands[0].rect[0] == 0
+
+
+def test_exposure_change_is_no_hand():
+    # The whole picture brightening at once is auto exposure, not movement
+    rng = np.random.default_rng(SEED)
+    analyzer = bb.MotionAnalyzer(WIDTH, HEIGHT)
+    for _ in range(5):
+        analyzer.analyze(still_frame(rng))
+    frame = still_frame(rng) + np.uint8(40)
+    assert analyzer.analyze(frame).hands == []